@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""helpers shared by the benchmarks
+
+The benchmarks are run from the source tree on a Checkmk site, e.g.
+  OMD[mysite]:~$ python3 benchmarks/bench_parse.py
+"""
+
+# License: GNU General Public License v2
+
+import importlib.util
+import json
+import sys
+import timeit
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent / "cmk_addons_plugins" / "dell"
+
+
+def load_plugin_module(relpath: str, name: str):
+    """import a module of the plugin package from the source tree"""
+    spec = importlib.util.spec_from_file_location(
+        f"cmk_addons.plugins.dell.{name}", PLUGIN_DIR / relpath)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_volumes(count: int, appliances: int = 4) -> list[dict]:
+    return [
+        {
+            "appliance_id": f"A{1 + i % appliances}",
+            "id": f"{i:08x}-7d0c-4f6e-9c55-5e8c2d6b{i:04x}",
+            "logical_used": i * 1024**2,
+            "name": f"vol-{i:05d}",
+            "size": 10 * 1024**3,
+            "state": "Ready",
+            "type": "Primary",
+        }
+        for i in range(count)
+    ]
+
+
+def agent_line(data) -> str:
+    """a section as the special agent writes it"""
+    return json.dumps(data, sort_keys=True)
+
+
+def best_of(stmt, number: int = 5, repeat: int = 5) -> float:
+    """the best time of a single run of stmt in seconds"""
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+
+def report(label: str, seconds: float, baseline: float | None = None) -> None:
+    speedup = f"  x{baseline / seconds:5.2f}" if baseline else ""
+    print(f"{label:<40} {seconds * 1000:10.3f} ms{speedup}")
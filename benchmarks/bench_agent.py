@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""end to end run of the special agent against the PowerStore simulator
+
+Reports wall time, peak RSS of the agent and the bytes the simulator sent for
+each scenario. The agent is imported from cmk_addons.plugins.dell, so the
+package of the source tree has to be installed (or linked) on the site:
+  OMD[mysite]:~$ python3 benchmarks/bench_agent.py --latency 0.02
+  OMD[mysite]:~$ python3 benchmarks/bench_agent.py --scenario large -- --volume-performance
+"""
+
+# License: GNU General Public License v2
+
+import argparse
+import json
+import os
+import ssl
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+from _common import PLUGIN_DIR
+
+SIMULATOR = Path(__file__).resolve().parent / "powerstore_sim.py"
+AGENT = PLUGIN_DIR / "libexec" / "agent_dell_powerstore"
+
+# name: (appliances, volumes)
+SCENARIOS = {
+    "small": (1, 1000),
+    "medium": (10, 10000),
+    "large": (100, 50000),
+}
+
+
+def sim_stats(port: int) -> dict[str, int]:
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    with urllib.request.urlopen(f"https://127.0.0.1:{port}/api/rest/_stats",
+                                context=ctx) as response:
+        return json.load(response)
+
+
+def start_simulator(appliances: int, volumes: int, latency: float,
+                    fail_rate: float) -> tuple[subprocess.Popen, int]:
+    sim = subprocess.Popen(
+        [sys.executable, str(SIMULATOR), "--port", "0", "--appliances", str(appliances),
+         "--volumes", str(volumes), "--latency", str(latency), "--fail-rate", str(fail_rate)],
+        stdout=subprocess.PIPE, text=True)
+    # listening on https://127.0.0.1:PORT
+    port = int(sim.stdout.readline().rsplit(":", 1)[1])
+    return sim, port
+
+
+def run_agent(port: int, agent_args: list[str]) -> tuple[float, int, int]:
+    """wall time in seconds, peak RSS in KiB and output size of one agent run"""
+    from powerstore_sim import PASSWORD, USER  # pylint: disable=import-outside-toplevel
+
+    t0 = time.monotonic()
+    agent = subprocess.Popen(
+        [sys.executable, str(AGENT), "-u", USER, "-s", PASSWORD, "--no-cert-check",
+         "-p", str(port), "--no-session-cache", "--no-section-cache",
+         *agent_args, "127.0.0.1"],
+        stdout=subprocess.PIPE)
+    size = 0
+    while chunk := agent.stdout.read(1 << 16):
+        size += len(chunk)
+    _pid, status, rusage = os.wait4(agent.pid, 0)
+    agent.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.monotonic() - t0
+    if agent.returncode:
+        raise RuntimeError(f"agent failed with exit code {agent.returncode}")
+    return wall, rusage.ru_maxrss, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="scenarios to run (default all)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the simulator adds to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="share of the requests the simulator fails by 503")
+    parser.add_argument("--runs", type=int, default=1, help="agent runs per scenario")
+    parser.add_argument("agent_args", nargs="*", help="additional arguments of the agent")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<10} {'appl':>5} {'volumes':>8} {'wall s':>8} {'RSS MiB':>8} "
+          f"{'requests':>8} {'recv MiB':>9} {'out MiB':>8}")
+    for name in args.scenario or SCENARIOS:
+        appliances, volumes = SCENARIOS[name]
+        sim, port = start_simulator(appliances, volumes, args.latency, args.fail_rate)
+        try:
+            for _ in range(args.runs):
+                before = sim_stats(port)
+                wall, rss, size = run_agent(port, args.agent_args)
+                after = sim_stats(port)
+                print(f"{name:<10} {appliances:>5} {volumes:>8} {wall:>8.2f} {rss / 1024:>8.1f} "
+                      f"{after['requests'] - before['requests']:>8} "
+                      f"{(after['bytes'] - before['bytes']) / 1024**2:>9.2f} "
+                      f"{size / 1024**2:>8.2f}", flush=True)
+        finally:
+            sim.terminate()
+            sim.wait()
+
+
+if __name__ == "__main__":
+    main()
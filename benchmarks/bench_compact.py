@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""size and parse time of the volume and hardware sections in the compact encoding"""
+
+# License: GNU General Public License v2
+
+import io
+
+from _common import agent_line, best_of, load_plugin_module, report, synthetic_volumes
+from bench_hardware import synthetic_hardware
+
+powerstore_lib = load_plugin_module("powerstore_lib.py", "powerstore_lib")
+agent = load_plugin_module("special_agents/agent_dell_powerstore.py",
+                           "special_agents.agent_dell_powerstore")
+
+
+def compact_line(name: str, data) -> str:
+    """a section as the special agent writes it with --compact"""
+    out = io.StringIO()
+    agent.write_compact(out, data, agent.COMPACT_INTERNED[name])
+    return out.getvalue()[:-1]
+
+
+def main() -> None:
+    for name, data, parse in (
+            ("volume", synthetic_volumes(10000), powerstore_lib.parse_dell_powerstore_volume),
+            ("volume", synthetic_volumes(50000, appliances=100),
+             powerstore_lib.parse_dell_powerstore_volume),
+            ("hardware", synthetic_hardware(), powerstore_lib.parse_dell_powerstore_hardware),
+    ):
+        plain = [[agent_line(data)]]
+        compact = [[compact_line(name, data)]]
+        assert powerstore_lib.parse_dell_powerstore(compact) == data
+
+        size, compact_size = len(plain[0][0]), len(compact[0][0])
+        print(f"{name} section of {len(data)} rows, {size} bytes, compact {compact_size} "
+              f"bytes ({compact_size / size:.0%})")
+        baseline = best_of(lambda: powerstore_lib.parse_dell_powerstore(plain))
+        report("parse_dell_powerstore, array of objects", baseline)
+        report("parse_dell_powerstore, compact",
+               best_of(lambda: powerstore_lib.parse_dell_powerstore(compact)), baseline)
+        baseline = best_of(lambda: parse(plain))
+        report(f"{parse.__name__}, array of objects", baseline)
+        report(f"{parse.__name__}, compact", best_of(lambda: parse(compact)), baseline)
+
+    # snapshots and clones may lack fields or report them as null, they must not
+    # break the parse of the section, neither if the first row lacks a field
+    primary, snapshot = synthetic_volumes(2)
+    snapshot = {**snapshot, "type": "Snapshot", "logical_used": None}
+    clone = {k: v for k, v in synthetic_volumes(3)[2].items() if k != "logical_used"}
+    for rows in ([primary, snapshot, clone], [clone, snapshot, primary]):
+        for line in (agent_line(rows), compact_line("volume", rows)):
+            parsed = powerstore_lib.parse_dell_powerstore_volume([[line]])
+            assert len(parsed) == 3
+            assert parsed[(primary["appliance_id"], primary["name"])].logical_used == 0
+            assert parsed[(snapshot["appliance_id"], snapshot["name"])].logical_used is None
+            assert parsed[(clone["appliance_id"], clone["name"])].logical_used is None
+
+
+if __name__ == "__main__":
+    main()
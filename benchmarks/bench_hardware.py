@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""parse_dell_powerstore_hardware on a synthetic component tree"""
+
+# License: GNU General Public License v2
+
+import json
+
+from _common import agent_line, best_of, load_plugin_module, report
+
+powerstore_lib = load_plugin_module("powerstore_lib.py", "powerstore_lib")
+
+
+def synthetic_hardware(appliances: int = 8, enclosures: int = 6, drives: int = 96,
+                       io_modules: int = 4, sfps: int = 4) -> list[dict]:
+    """appliances with expansion enclosures of drives and nodes with IO modules and SFPs"""
+    hw = []
+
+    def add(id_, name, type_, slot, parent_id, app_id):
+        hw.append({
+            "appliance_id": app_id, "extra_details": {}, "id": id_, "lifecycle_state": "Healthy",
+            "name": name, "parent_id": parent_id, "slot": slot, "stale_state": "Not_Stale",
+            "type": type_,
+        })
+
+    for a in range(appliances):
+        app_id = f"A{a + 1}"
+        base = f"{app_id}-base"
+        add(base, "BaseEnclosure", "Base_Enclosure", 0, None, app_id)
+        for n in range(2):
+            node = f"{base}-node{n}"
+            add(node, f"BaseEnclosure-Node{'AB'[n]}", "Node", n, base, app_id)
+            for m in range(io_modules):
+                iom = f"{node}-iom{m}"
+                add(iom, f"BaseEnclosure-Node{'AB'[n]}-IoModule{m}", "IO_Module", m, node, app_id)
+                for p in range(sfps):
+                    add(f"{iom}-sfp{p}", f"BaseEnclosure-Node{'AB'[n]}-IoModule{m}-SFP{p}",
+                        "SFP", p, iom, app_id)
+        for e in range(enclosures):
+            enc = f"{app_id}-enc{e}"
+            add(enc, f"Enclosure{e}", "Expansion_Enclosure", e + 1, base, app_id)
+            for d in range(drives):
+                add(f"{enc}-drive{d}", f"Enclosure{e}-Drive{d}", "Drive", d, enc, app_id)
+    return hw
+
+
+def parse_recursive(string_table):
+    """the former implementation, recurses to the root for every component"""
+    section = json.loads("".join("".join(x) for x in string_table))
+    by_id = { x['id']: x for x in section }
+
+    def _short_cut(d: dict) -> str:
+        t = d['type']
+        sc = t if len(t) <= 10 else ''.join(c for c in t if c.isupper() or c.isdigit())
+        sc += f":{int(d['slot']):02d}"
+        n = d['name']
+        ns = n.split('-')
+        if len(ns) > 1:
+            scn = ns[-1]
+            if scn[-1].isdigit() and not scn[-2].isdigit():
+                scn = scn[0:-1] + ':0' + scn[-1]
+            if len(scn) +2 <= len(sc):
+                return scn
+        return sc
+
+    def _hw_path(d: dict) -> str:
+        sc = _short_cut(d)
+        return _hw_path(by_id[d['parent_id']]) + '/' + sc if d['parent_id'] else d['appliance_id']
+
+    return { _hw_path(x): x for x in section }
+
+
+def main() -> None:
+    hardware = synthetic_hardware()
+    string_table = [[agent_line(hardware)]]
+    assert powerstore_lib.parse_dell_powerstore_hardware(string_table) == parse_recursive(string_table)
+
+    print(f"{len(hardware)} hardware components")
+    baseline = best_of(lambda: parse_recursive(string_table))
+    report("recursive path builder", baseline)
+    report("parse_dell_powerstore_hardware",
+           best_of(lambda: powerstore_lib.parse_dell_powerstore_hardware(string_table)), baseline)
+
+    # a missing parent and a cycle must not break the parse
+    broken = hardware + [
+        {**hardware[-1], "id": "orphan", "parent_id": "missing"},
+        {**hardware[-1], "id": "cycle1", "slot": 101, "parent_id": "cycle2"},
+        {**hardware[-1], "id": "cycle2", "slot": 102, "parent_id": "cycle1"},
+    ]
+    parsed = powerstore_lib.parse_dell_powerstore_hardware([[agent_line(broken)]])
+    assert len(parsed) == len(hardware) + 3
+
+
+if __name__ == "__main__":
+    main()
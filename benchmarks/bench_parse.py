@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""parse_dell_powerstore on a section of 10000 volumes"""
+
+# License: GNU General Public License v2
+
+import json
+
+from _common import agent_line, best_of, load_plugin_module, report, synthetic_volumes
+
+powerstore_lib = load_plugin_module("powerstore_lib.py", "powerstore_lib")
+
+
+def parse_joined(string_table):
+    """the former implementation, joins the string table first"""
+    return json.loads("".join("".join(x) for x in string_table))
+
+
+def main() -> None:
+    volumes = synthetic_volumes(10000)
+    string_table = [[agent_line(volumes)]]
+    assert powerstore_lib.parse_dell_powerstore(string_table) == volumes
+
+    print(f"section of {len(volumes)} volumes, {len(string_table[0][0])} bytes, "
+          f"decoder {powerstore_lib._json_loads.__module__}")
+    baseline = best_of(lambda: parse_joined(string_table))
+    report("json.loads of the joined string table", baseline)
+    report("parse_dell_powerstore",
+           best_of(lambda: powerstore_lib.parse_dell_powerstore(string_table)), baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""import time budget of the special agent
+
+Imports the agent module in a fresh interpreter with -X importtime and fails
+if the best import time of the agent exceeds the budget, or if a module only
+needed to talk to the array is imported at module load. The Checkmk modules
+the agent imports (cmk.special_agents, cmk.utils) are reported separately and
+not counted, they are loaded by every special agent and not ours to budget.
+The package of the source tree has to be installed (or linked) on the site:
+  OMD[mysite]:~$ python3 benchmarks/check_import_time.py --budget-ms 30
+"""
+
+# License: GNU General Public License v2
+
+import argparse
+import subprocess
+import sys
+
+AGENT_MODULE = "cmk_addons.plugins.dell.special_agents.agent_dell_powerstore"
+
+# imported by the agent where they are used, never at module load
+LAZY_MODULES = (
+    "requests",
+    "urllib3",
+    "cmk_addons.plugins.dell.powerstore_api",
+    "concurrent.futures.thread",
+    "hashlib",
+    "tempfile",
+)
+
+
+def import_tree(module: str) -> list[tuple[str, int, int]]:
+    """the modules imported by importing module with their depth and cumulative time in µs
+
+    -X importtime reports an import after the ones it caused, indented by
+    their depth. The tree of the module are the lines before its own line up
+    to the previous import at the top level.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    tree: list[tuple[str, int, int]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return tree + [(module, 0, int(cumulative))]
+            tree = []
+            continue
+        tree.append((name.strip(), depth, int(cumulative)))
+    raise RuntimeError(f"{module} not found in the -X importtime output")
+
+
+def checkmk_time(tree: list[tuple[str, int, int]]) -> int:
+    """the cumulative time in µs of the Checkmk modules imported directly by the agent"""
+    return sum(cumulative for name, depth, cumulative in tree
+               if depth == 1 and (name == "cmk" or name.startswith("cmk.")))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--budget-ms", type=float, default=30.0,
+                        help="maximal import time of the agent without the Checkmk modules "
+                        "(default 30 ms)")
+    parser.add_argument("--runs", type=int, default=5,
+                        help="imports to take the best time of (default 5)")
+    args = parser.parse_args()
+
+    trees = [import_tree(AGENT_MODULE) for _ in range(args.runs)]
+    best = min(tree[-1][2] - checkmk_time(tree) for tree in trees) / 1000
+    checkmk = min(checkmk_time(tree) for tree in trees) / 1000
+    print(f"{AGENT_MODULE}: {best:.1f} ms (budget {args.budget_ms:.1f} ms), "
+          f"Checkmk modules {checkmk:.1f} ms")
+    for name, _depth, cumulative in sorted(trees[0], key=lambda x: -x[2])[1:11]:
+        print(f"  {cumulative / 1000:8.1f} ms {name}")
+
+    failed = False
+    eager = [m for m in LAZY_MODULES
+             if any(name == m or name.startswith(m + ".") for name, _, _ in trees[0])]
+    if eager:
+        print(f"FAIL: imported at module load: {', '.join(eager)}")
+        failed = True
+    if best > args.budget_ms:
+        print(f"FAIL: import time exceeds the budget by {best - args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""local stand-in for the PowerStore REST API
+
+Serves synthetic appliances, hardware, nodes, FC ports and volumes over HTTPS
+the way the agent reads them from a real array:
+  * login_session with basic auth, answered by an auth_cookie and a DELL-EMC-TOKEN
+  * the DELL-EMC-TOKEN header is required for POST requests
+  * collections longer than a page are answered by 206 with Content-Range
+  * select= restricts the returned fields
+  * metrics/generate returns a series of samples for the requested interval
+  * replies are gzip compressed if the client accepts it
+  * a share of the requests can be failed by 503 Service Unavailable
+
+  python3 benchmarks/powerstore_sim.py --appliances 10 --volumes 10000 --latency 0.02
+
+The counters of the server are available unauthenticated at /api/rest/_stats.
+"""
+
+# License: GNU General Public License v2
+
+import argparse
+import base64
+import gzip
+import json
+import random
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+USER = "admin"
+PASSWORD = "Password123!"
+TOKEN = "e9a3f6c4b5d24f9c8a7e"
+COOKIE = "auth_cookie=7e1fd8a9c3b6"
+
+# interval: (step in seconds, samples in the series)
+STEPS = {
+    "Twenty_Sec": (20, 180),
+    "Five_Mins": (300, 288),
+    "One_Hour": (3600, 720),
+    "One_Day": (86400, 730),
+}
+
+
+class DataSet:
+    """the synthetic objects of a cluster"""
+
+    def __init__(self, appliances: int, volumes: int):
+        self.collections = {
+            "appliance": [
+                {
+                    "id": f"A{a}",
+                    "name": f"PS-{a:03d}",
+                    "model": "PowerStore 500T",
+                    "node_count": 2,
+                    "service_tag": f"ST{a:05d}",
+                } for a in range(1, appliances + 1)
+            ],
+        }
+        nodes = [
+            {
+                "id": f"N{a}{ab}",
+                "name": f"PS-{a:03d}-node-{ab}",
+                "appliance_id": f"A{a}",
+                "slot": slot,
+            } for a in range(1, appliances + 1) for slot, ab in enumerate("AB")
+        ]
+        self.collections["node"] = nodes
+        self.collections["fc_port"] = [
+            {
+                "id": f"P{n['id']}{k}",
+                "name": f"{n['name']}-FEPort{k}",
+                "appliance_id": n["appliance_id"],
+                "node_id": n["id"],
+            } for n in nodes for k in range(4)
+        ]
+        self.collections["hardware"] = list(self._hardware(appliances))
+        self.collections["volume"] = [
+            {
+                "id": f"{i:08x}-7d0c-4f6e-9c55-5e8c2d6b{i % 65536:04x}",
+                "name": f"vol-{i:05d}",
+                "type": "Primary",
+                "state": "Ready",
+                "size": 10 * 1024**3,
+                "logical_used": i * 1024**2 % (10 * 1024**3),
+                "appliance_id": f"A{1 + i % appliances}",
+                "description": "synthetic volume of the PowerStore simulator",
+                "wwn": f"naa.68ccf09800{i:022x}",
+            } for i in range(volumes)
+        ]
+
+    @staticmethod
+    def _hardware(appliances: int):
+        for a in range(1, appliances + 1):
+            common = {
+                "appliance_id": f"A{a}",
+                "lifecycle_state": "Healthy",
+                "stale_state": "Not_Stale",
+            }
+            yield {
+                "id": f"A{a}E0", "name": "BaseEnclosure", "type": "Base_Enclosure",
+                "slot": 0, "parent_id": None, "extra_details": {}, **common,
+            }
+            for ab in "AB":
+                yield {
+                    "id": f"A{a}N{ab}", "name": f"BaseEnclosure-Node{ab}", "type": "Node",
+                    "slot": "AB".index(ab), "parent_id": f"A{a}E0", "extra_details": {},
+                    **common,
+                }
+            for d in range(25):
+                yield {
+                    "id": f"A{a}D{d}", "name": f"BaseEnclosure-Drive{d}", "type": "Drive",
+                    "slot": d, "parent_id": f"A{a}E0",
+                    "extra_details": {
+                        "drive_type": "NVMe_SSD",
+                        "size": 1920383410176,
+                        "firmware_version": "PSFH",
+                    },
+                    **common,
+                }
+
+    @staticmethod
+    def series(entity: str, entity_id: str, interval: str) -> list[dict]:
+        if interval == "Best_Available":
+            interval = "Five_Mins" if entity.startswith("space") else "Twenty_Sec"
+        step, count = STEPS[interval]
+        now = int(time.time()) // step * step
+        # performance_metrics_by_fe_fc_port -> fe_fc_port_id
+        id_field = entity.split("_by_", 1)[-1] + "_id"
+        rows = []
+        for k in range(count):
+            ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now - (count - 1 - k) * step))
+            if entity.startswith("space"):
+                rows.append({
+                    "appliance_id": entity_id,
+                    "timestamp": ts,
+                    "physical_total": 10**14,
+                    "physical_used": 5 * 10**13 + k * 10**9,
+                    "data_reduction": 3.1,
+                    "efficiency_ratio": 5.0,
+                })
+            else:
+                rows.append({
+                    "entity": entity,
+                    "timestamp": ts,
+                    id_field: entity_id,
+                    "total_iops": 1000.0 + k,
+                    "total_bandwidth": 1.0e8,
+                    "read_iops": 500.0,
+                    "write_iops": 500.0 + k,
+                    "avg_latency": 300.0,
+                })
+        return rows
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "Simulator"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, code: int, body, headers: dict[str, str] | None = None) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in (self.headers.get("Accept-Encoding") or "") and len(data) > 1024:
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        if not self.path.endswith("/_stats"):
+            self.server.count(len(data))
+
+    def _authorized(self) -> bool:
+        return COOKIE in (self.headers.get("Cookie") or "")
+
+    def _unavailable(self) -> bool:
+        if random.random() >= self.server.fail_rate:
+            return False
+        self._send(503, {"messages": [{"code": "0xE0101001000C"}]}, {"Retry-After": "1"})
+        return True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        path, _, query = self.path.partition("?")
+        path = path.removeprefix("/api/rest/")
+        if path == "_stats":
+            return self._send(200, self.server.stats())
+        self.server.count(0, request=True)
+        time.sleep(self.server.latency)
+        if self._unavailable():
+            return None
+        if path == "login_session":
+            expected = base64.b64encode(f"{USER}:{PASSWORD}".encode()).decode()
+            if self.headers.get("Authorization") != f"Basic {expected}":
+                return self._send(401, {"messages": [{"code": "0xE09010010001"}]})
+            self.server.count(0, login=True)
+            return self._send(200, [{"id": "session1", "user": USER}], {
+                "Set-Cookie": f"{COOKIE}; Path=/; Secure; HttpOnly",
+                "DELL-EMC-TOKEN": TOKEN,
+            })
+        if not self._authorized():
+            return self._send(401, {})
+        if path == "openapi.json":
+            return self._send(200, {
+                "openapi": "3.0.3",
+                "info": {"title": "PowerStore REST API", "version": "3.6.0.0"},
+                "paths": {f"/path{i}": {"get": {"summary": "x" * 200}} for i in range(500)},
+            })
+        rows = self.server.data.collections.get(path)
+        if rows is None:
+            return self._send(404, {})
+        select = parse_qs(query).get("select", ["*"])[0]
+        if select != "*":
+            fields = select.split(",")
+            rows = [{f: r[f] for f in fields if f in r} for r in rows]
+        page = self.server.page_size
+        wanted = self.headers.get("Range")
+        if not wanted and len(rows) <= page:
+            return self._send(200, rows)
+        first, _, last = (wanted or "0-").partition("-")
+        first = int(first)
+        last = min(int(last) if last else first + page - 1, first + page - 1, len(rows) - 1)
+        return self._send(206, rows[first:last + 1],
+                          {"Content-Range": f"{first}-{last}/{len(rows)}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.server.count(0, request=True)
+        time.sleep(self.server.latency)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        if self._unavailable():
+            return None
+        if not self._authorized():
+            return self._send(401, {})
+        if self.headers.get("DELL-EMC-TOKEN") != TOKEN:
+            return self._send(403, {"messages": [{"code": "0xE09010020001"}]})
+        if self.path.removeprefix("/api/rest/") != "metrics/generate":
+            return self._send(404, {})
+        return self._send(200, DataSet.series(body["entity"], body["entity_id"], body["interval"]))
+
+
+class Simulator(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, data: DataSet, latency: float, page_size: int,
+                 fail_rate: float = 0.0):
+        super().__init__(address, Handler)
+        self.data = data
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "logins": 0, "bytes": 0}
+
+    def count(self, size: int, request: bool = False, login: bool = False) -> None:
+        with self._lock:
+            self._stats["bytes"] += size
+            self._stats["requests"] += request
+            self._stats["logins"] += login
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+def self_signed_cert(directory: Path) -> tuple[Path, Path]:
+    """a throwaway certificate for localhost"""
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+         "-subj", "/CN=localhost", "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True)
+    return cert, key
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--address", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--appliances", type=int, default=1)
+    parser.add_argument("--volumes", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="share of the requests answered by 503 (0.0 to 1.0)")
+    parser.add_argument("--page-size", type=int, default=2000,
+                        help="rows per page of a collection (2000 as on a PowerStore)")
+    parser.add_argument("--cert", type=Path, help="certificate, self signed if missing")
+    parser.add_argument("--key", type=Path)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_arguments(argv)
+    server = Simulator((args.address, args.port), DataSet(args.appliances, args.volumes),
+                       args.latency, args.page_size, args.fail_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = (args.cert, args.key) if args.cert else self_signed_cert(Path(tmp))
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert, key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    print(f"listening on https://{args.address}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
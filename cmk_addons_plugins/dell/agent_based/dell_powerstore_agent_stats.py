@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+
+# License: GNU General Public License v2
+
+from cmk.agent_based.v2 import (
+    AgentSection,
+    CheckPlugin,
+    CheckResult,
+    check_levels,
+    DiscoveryResult,
+    render,
+    Result,
+    Service,
+    State,
+)
+from cmk_addons.plugins.dell.powerstore_lib import (
+    DellPowerStoreAgentStats,
+    parse_dell_powerstore_agent_stats,
+)
+
+
+agent_section_dell_powerstore_agent_stats = AgentSection(
+    name="dell_powerstore_agent_stats",
+    parse_function=parse_dell_powerstore_agent_stats,
+    parsed_section_name="dell_powerstore_agent_stats",
+)
+
+
+def discovery_dell_powerstore_agent_stats(
+        section: DellPowerStoreAgentStats
+        ) -> DiscoveryResult:
+    yield Service()
+
+
+def check_dell_powerstore_agent_stats(
+        section: DellPowerStoreAgentStats
+        ) -> CheckResult:
+    calls = section.calls.values()
+    for name, error in sorted(section.failed.items()):
+        if name in section.stale:
+            yield Result(state=State.WARN, summary=f"Section {name} failed, " \
+                    f"data of {render.timespan(section.stale[name])} ago used: {error}")
+        else:
+            yield Result(state=State.CRIT, summary=f"Section {name} failed: {error}")
+    yield from check_levels(
+            section.wall_time,
+            label="Run time",
+            render_func=render.timespan,
+            metric_name="dell_powerstore_agent_wall_time",
+        )
+    if section.cpu_time is not None:
+        yield from check_levels(
+                section.cpu_time,
+                label="CPU time",
+                render_func=render.timespan,
+                metric_name="dell_powerstore_agent_cpu_time",
+            )
+    yield from check_levels(
+            sum(c.requests for c in calls),
+            label="Requests",
+            render_func=str,
+            metric_name="dell_powerstore_agent_requests",
+        )
+    yield from check_levels(
+            sum(c.bytes for c in calls),
+            label="Received",
+            render_func=render.bytes,
+            metric_name="dell_powerstore_agent_received",
+        )
+    if section.peak_rss is not None:
+        yield from check_levels(
+                section.peak_rss,
+                label="Peak memory",
+                render_func=render.bytes,
+                metric_name="dell_powerstore_agent_peak_rss",
+            )
+    yield from check_levels(
+            section.write_time,
+            label="Writing the sections",
+            render_func=render.timespan,
+            metric_name="dell_powerstore_agent_write_time",
+            notice_only=True,
+        )
+    yield Result(state=State.OK, notice=f"Connections opened: {section.connections}")
+    for name, c in sorted(section.calls.items(), key=lambda x: -x[1].seconds):
+        status = ", ".join(f"{n}x {code}" for code, n in sorted(c.status.items()))
+        yield Result(state=State.OK, notice=f"{name}: {c.requests} requests, " \
+                f"{render.timespan(c.seconds)} (max. {render.timespan(c.max_seconds)}), " \
+                f"{render.bytes(c.bytes)}, status {status}")
+
+
+check_plugin_dell_powerstore_agent_stats = CheckPlugin(
+    name="dell_powerstore_agent_stats",
+    service_name="PowerStore Agent",
+    sections=["dell_powerstore_agent_stats"],
+    discovery_function=discovery_dell_powerstore_agent_stats,
+    check_function=check_dell_powerstore_agent_stats,
+)
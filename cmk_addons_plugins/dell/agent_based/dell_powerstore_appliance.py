@@ -13,38 +13,36 @@ from cmk.agent_based.v2 import (
     State,
 )
 from cmk_addons.plugins.dell.powerstore_lib import (
-    DellPowerStoreAPIData,
-    parse_dell_powerstore,
+    DellPowerStoreAppliances,
+    parse_dell_powerstore_appliance,
 )
 
 
 agent_section_appliance = AgentSection(
     name="appliance",
-    parse_function=parse_dell_powerstore,
+    parse_function=parse_dell_powerstore_appliance,
     parsed_section_name="appliance",
 )
 
 
 def discovery_dell_powerstore_appliance(
-        section: DellPowerStoreAPIData
+        section: DellPowerStoreAppliances
         ) -> DiscoveryResult:
     for item in section:
-        if 'id' in item:
-            yield Service(item=item["id"])
+        yield Service(item=item)
 
 
 def check_dell_powerstore_appliance(
-        item, section: DellPowerStoreAPIData
+        item, section: DellPowerStoreAppliances
         ) -> CheckResult:
-    idmap = dict([(item.get("id"), item) for item in section])
-    if item in idmap:
-        d = idmap[item]
-        yield Result(state=State.OK, summary=f"Name: {d.get('name')}, " \
-                f"Model: {d.get('model', 'unknown')}, " \
-                f"Node Count: {d.get('node_count', 'unknown')}, " \
-                f"Service Tag: {d.get('service_tag', 'unknown')}")
+    if item in section:
+        d = section[item]
+        yield Result(state=State.OK, summary=f"Name: {d.name}, " \
+                f"Model: {d.model}, " \
+                f"Node Count: {d.node_count}, " \
+                f"Service Tag: {d.service_tag}")
     else:
-        yield Result(state=State.UKWN, summary="Item not found(!!)")
+        yield Result(state=State.UNKNOWN, summary="Item not found(!!)")
 
 
 check_plugin_dell_powerstore_appliance = CheckPlugin(
@@ -46,7 +46,7 @@ def check_dell_powerstore_hardware(
         ) -> CheckResult:
 
     if item not in section:
-        yield Result(state=UNKNOWN, summary='data not found')
+        yield Result(state=State.UNKNOWN, summary='data not found')
         return
 
     d = section[item]
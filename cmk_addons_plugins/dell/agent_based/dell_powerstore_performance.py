@@ -3,6 +3,8 @@
 
 # License: GNU General Public License v2
 
+import time
+
 from cmk.agent_based.v2 import (
     AgentSection,
     CheckPlugin,
@@ -15,46 +17,66 @@ from cmk.agent_based.v2 import (
     State,
 )
 from cmk_addons.plugins.dell.powerstore_lib import (
-    DellPowerStoreAPIData,
-    parse_dell_powerstore,
+    DellPowerStorePerformances,
+    parse_dell_powerstore_performance_by_appliance,
+    parse_dell_powerstore_performance_by_name,
+    parse_dell_powerstore_performance_by_volume,
 )
-import datetime
 
 
 agent_section_performance_metrics_by_appliance = AgentSection(
     name="performance_metrics_by_appliance",
-    parse_function=parse_dell_powerstore,
+    parse_function=parse_dell_powerstore_performance_by_appliance,
     parsed_section_name="performance_metrics_by_appliance",
 )
 
+agent_section_performance_metrics_by_node = AgentSection(
+    name="performance_metrics_by_node",
+    parse_function=parse_dell_powerstore_performance_by_name,
+    parsed_section_name="performance_metrics_by_node",
+)
+
+agent_section_performance_metrics_by_fe_fc_port = AgentSection(
+    name="performance_metrics_by_fe_fc_port",
+    parse_function=parse_dell_powerstore_performance_by_name,
+    parsed_section_name="performance_metrics_by_fe_fc_port",
+)
+
+agent_section_performance_metrics_by_volume = AgentSection(
+    name="performance_metrics_by_volume",
+    parse_function=parse_dell_powerstore_performance_by_volume,
+    parsed_section_name="performance_metrics_by_volume",
+)
+
 
 def discovery_dell_powerstore_performance(
-        section: DellPowerStoreAPIData
+        section: DellPowerStorePerformances
         ) -> DiscoveryResult:
     for item in section:
-        if 'appliance_id' in item:
-            yield Service(item=item["appliance_id"])
+        yield Service(item=item)
 
 
 def check_dell_powerstore_performance(
-        item, section: DellPowerStoreAPIData
+        item, section: DellPowerStorePerformances
         ) -> CheckResult:
-    for d in section:
-        if item == d["appliance_id"]:
-#            dt = datetime.datetime.strptime(d["timestamp"], "%Y-%m-%dT%H:%M:%SZ")
-#            dt = dt.replace(tzinfo=datetime.timezone.utc)
-#            dt = dt.astimezone()
-            total_iops = float(d["total_iops"])
-            total_bandwidth = float(d["total_bandwidth"])
-            yield Metric(f"total_iops", total_iops)
-            yield Metric(f"total_bandwidth", total_bandwidth)
-            yield Result(state=State.OK, summary=f"Timestamp {dt}: "\
-                    f"total_iops: {total_iops} IO/s, " \
-                    f"total_bandwidth: {render.iobandwidth(total_bandwidth)}, " \
-                    )
-            return
-    else:
+    d = section.get(item)
+    if d is None:
         yield Result(state=State.UNKNOWN, summary="Item not found(!!)")
+        return
+    dt = d.timestamp.astimezone()
+    yield Metric("total_iops", d.total_iops)
+    yield Metric("total_bandwidth", d.total_bandwidth)
+    yield Result(state=State.OK, summary=f"Timestamp {dt}: "\
+            f"total_iops: {d.total_iops} IO/s, " \
+            f"total_bandwidth: {render.iobandwidth(d.total_bandwidth)}" \
+            )
+    if d.collected is not None:
+        # collected in turns with other volumes, stale if two turns were missed
+        age = time.time() - d.collected
+        stale = d.refresh is not None and age > 2 * d.refresh
+        yield Result(state=State.WARN if stale else State.OK,
+                     summary=f"Collected {render.timespan(age)} ago" \
+                     f"{' (stale)' if stale else ''}")
 
 
 check_plugin_dell_powerstore_performance = CheckPlugin(
@@ -64,3 +86,27 @@ check_plugin_dell_powerstore_performance = CheckPlugin(
     discovery_function=discovery_dell_powerstore_performance,
     check_function=check_dell_powerstore_performance,
 )
+
+check_plugin_dell_powerstore_performance_node = CheckPlugin(
+    name="dell_powerstore_performance_node",
+    service_name="Performance Node %s",
+    sections=["performance_metrics_by_node"],
+    discovery_function=discovery_dell_powerstore_performance,
+    check_function=check_dell_powerstore_performance,
+)
+
+check_plugin_dell_powerstore_performance_fe_fc_port = CheckPlugin(
+    name="dell_powerstore_performance_fe_fc_port",
+    service_name="Performance FC Port %s",
+    sections=["performance_metrics_by_fe_fc_port"],
+    discovery_function=discovery_dell_powerstore_performance,
+    check_function=check_dell_powerstore_performance,
+)
+
+check_plugin_dell_powerstore_performance_volume = CheckPlugin(
+    name="dell_powerstore_performance_volume",
+    service_name="Performance Volume %s",
+    sections=["performance_metrics_by_volume"],
+    discovery_function=discovery_dell_powerstore_performance,
+    check_function=check_dell_powerstore_performance,
+)
@@ -9,6 +9,7 @@ from cmk.agent_based.v2 import (
     CheckResult,
     check_levels,
     DiscoveryResult,
+    get_value_store,
     LevelsT,
     Metric,
     render,
@@ -17,26 +18,24 @@ from cmk.agent_based.v2 import (
     State,
 )
 from cmk_addons.plugins.dell.powerstore_lib import (
-    DellPowerStoreAPIData,
-    parse_dell_powerstore,
+    DellPowerStoreSpaces,
+    parse_dell_powerstore_space,
 )
-from typing import Any, Generic, NotRequired, TypedDict, TypeVar
-import datetime
+from typing import Any, Generic, MutableMapping, NotRequired, Sequence, TypedDict, TypeVar
 
 
 agent_section_space_metrics_by_appliance = AgentSection(
     name="space_metrics_by_appliance",
-    parse_function=parse_dell_powerstore,
+    parse_function=parse_dell_powerstore_space,
     parsed_section_name="space_metrics_by_appliance",
 )
 
 
 def discovery_dell_powerstore_space(
-        section: DellPowerStoreAPIData
+        section: DellPowerStoreSpaces
         ) -> DiscoveryResult:
     for item in section:
-        if 'appliance_id' in item:
-            yield Service(item=item["appliance_id"])
+        yield Service(item=item)
 
 
 _NumberT = TypeVar("_NumberT", int, float)
@@ -50,39 +49,99 @@ class _Levels(TypedDict):
 
 class Params(TypedDict):
     capacity: _Levels
+    days_remaining: NotRequired[LevelsT[float]]
+    trend_days: NotRequired[int]
 
 _NO_LEVELS = _DualLevels(lower=("no_levels", None), upper=("no_levels", None))
 
+# The history keeps the latest sample of every hour, the agent seeds it with
+# hourly samples when it starts collecting.
+_HISTORY_BUCKET = 3600
+_MIN_TREND_SAMPLES = 3
+
+
+def _update_history(
+        value_store: MutableMapping[str, Any],
+        samples: Sequence[tuple[float, int]],
+        since: float,
+        ) -> list[tuple[float, int]]:
+    """merge the samples into the hourly history of the value store"""
+    buckets = {int(ts // _HISTORY_BUCKET): (ts, used)
+               for ts, used in value_store.get("history", []) if ts >= since}
+    for ts, used in samples:
+        if ts >= since:
+            bucket = int(ts // _HISTORY_BUCKET)
+            if bucket not in buckets or buckets[bucket][0] <= ts:
+                buckets[bucket] = (ts, used)
+    history = sorted(buckets.values())
+    value_store["history"] = history
+    return history
+
+
+def _growth_per_second(history: Sequence[tuple[float, int]]) -> float:
+    """slope of the least squares line through the history
+
+    Closed form from the sums of the centered values, one pass over the samples.
+    """
+    n = len(history)
+    mean_t = sum(ts for ts, _ in history) / n
+    mean_u = sum(used for _, used in history) / n
+    sxx = sxy = 0.0
+    for ts, used in history:
+        dt = ts - mean_t
+        sxx += dt * dt
+        sxy += dt * (used - mean_u)
+    return sxy / sxx if sxx else 0.0
+
+
+def _check_trend(
+        params: Params, d, now: float
+        ) -> CheckResult:
+    trend_days = params.get("trend_days", 7)
+    history = _update_history(get_value_store(), d.samples, now - trend_days * 86400)
+    if len(history) < _MIN_TREND_SAMPLES:
+        yield Result(state=State.OK, notice="Trend: not enough history yet")
+        return
+    growth = _growth_per_second(history) * 86400
+    yield Metric("physical_growth", growth)
+    sign = "-" if growth < 0 else "+"
+    yield Result(state=State.OK, summary=f"Growth: {sign}{render.bytes(abs(growth))}/day " \
+            f"(trend of {render.timespan(history[-1][0] - history[0][0])})")
+    if growth <= 0:
+        yield Result(state=State.OK, notice="Time until full: not growing")
+        return
+    yield from check_levels(
+            (d.physical_total - d.physical_used) / growth,
+            label="Time until full",
+            levels_lower=params.get("days_remaining", ("no_levels", None)),
+            render_func=lambda days: render.timespan(days * 86400),
+            metric_name="physical_days_until_full",
+        )
+
 
 def check_dell_powerstore_space(
-        item,  params: Params, section: DellPowerStoreAPIData
+        item,  params: Params, section: DellPowerStoreSpaces
         ) -> CheckResult:
-    for d in section:
-        if item == d["appliance_id"]:
-#            dt = datetime.datetime.strptime(d["timestamp"], "%Y-%m-%dT%H:%M:%SZ")
-#            dt = dt.replace(tzinfo=datetime.timezone.utc)
-#            dt = dt.astimezone()
-            physical_total = int(d['physical_total'])
-            physical_used = int(d['physical_used'])
-            physical_free = physical_total - physical_used
-            levels = params["capacity"]
-            perc_used = levels.get("perc_used", _NO_LEVELS)
-            data_reduction = float(d['data_reduction'])
-            yield Metric("physical_free", physical_free)
-            yield Metric("physical_used", physical_used)
-            yield Metric("data_reduction", data_reduction)
-            yield Result(state=State.OK, summary=f"Data reduction ratio: {data_reduction:0.2f}")
-            yield from check_levels(
-                    physical_used / physical_total * 100.0,
-                    label=f"Used space",
-                    levels_lower=perc_used["lower"],
-                    levels_upper=perc_used["upper"],
-                    render_func=render.percent,
-                    metric_name=f"physical_used_percent",
-                )
-            return
-    else:
+    d = section.get(item)
+    if d is None:
         yield Result(state=State.UNKNOWN, summary="Item not found(!!)")
+        return
+    physical_free = d.physical_total - d.physical_used
+    levels = params["capacity"]
+    perc_used = levels.get("perc_used", _NO_LEVELS)
+    yield Metric("physical_free", physical_free)
+    yield Metric("physical_used", d.physical_used)
+    yield Metric("data_reduction", d.data_reduction)
+    yield Result(state=State.OK, summary=f"Data reduction ratio: {d.data_reduction:0.2f}")
+    yield from check_levels(
+            d.physical_used / d.physical_total * 100.0,
+            label=f"Used space",
+            levels_lower=perc_used["lower"],
+            levels_upper=perc_used["upper"],
+            render_func=render.percent,
+            metric_name=f"physical_used_percent",
+        )
+    yield from _check_trend(params, d, d.timestamp.timestamp())
 
 
 check_plugin_dell_powerstore_space = CheckPlugin(
@@ -99,5 +158,7 @@ check_plugin_dell_powerstore_space = CheckPlugin(
                 upper=("fixed", (80.0, 90.0)),
             ),
         ),
+        days_remaining=("fixed", (30.0, 7.0)),
+        trend_days=7,
     ),
 )
@@ -18,48 +18,50 @@ from cmk.plugins.lib.df import (
     MAGIC_FACTOR_DEFAULT_PARAMS,
 )
 from cmk_addons.plugins.dell.powerstore_lib import (
-    DellPowerStoreAPIData,
-    parse_dell_powerstore,
+    DellPowerStoreVolumes,
+    parse_dell_powerstore_volume,
 )
 
 
 agent_section_volume = AgentSection(
     name="volume",
-    parse_function=parse_dell_powerstore,
+    parse_function=parse_dell_powerstore_volume,
     parsed_section_name="volume",
 )
 
 
 def discovery_dell_powerstore_volume(
-        section: DellPowerStoreAPIData
+        section: DellPowerStoreVolumes
         ) -> DiscoveryResult:
-    for d in section:
-        if d["type"] == "Primary":
-            item = d["appliance_id"] + " " + d["name"]
-            yield Service(item=item)
+    for (app_id, vol_name), d in section.items():
+        if d.type == "Primary":
+            yield Service(item=f"{app_id} {vol_name}")
 
 
 def check_dell_powerstore_volume(
         item: str,
         params: list[str],
-        section: DellPowerStoreAPIData
+        section: DellPowerStoreVolumes
         ) -> CheckResult:
     app_id, vol_name = item.split(" ", maxsplit=1)
-    for d in section:
-        if d["name"] == vol_name:
-            break
-    else:
+    d = section.get((app_id, vol_name))
+    if d is None:
         yield Result(state=State.UNKNOWN, summary=f"volume id {vol_name} not found")
+        return
 
-    used = d["logical_used"]
-    size = d["size"]
+    yield Result(state=State.OK if d.state == "Ready" else State.WARN,
+                    summary=f"State: {d.state}")
+    if d.size is None or d.logical_used is None:
+        yield Result(state=State.UNKNOWN, summary="Size or used space not reported")
+        return
+
+    used = d.logical_used
+    size = d.size
     free = size - used
     used_mb = used / 1024**2
     size_mb = size / 1024**2
     free_mb = free / 1024**2
 
-    yield Result(state=State.OK if d["state"] == "Ready" else State.WARN,
-                    summary=f"State: {d['state']}")
     yield from check_filesystem_levels(size_mb, size_mb, free_mb, used_mb,
                     params)
 
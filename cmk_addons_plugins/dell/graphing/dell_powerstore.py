@@ -25,6 +25,8 @@ UNIT_BYTES = Unit(IECNotation("B"), StrictPrecision(2))
 UNIT_PER_SECOND = Unit(DecimalNotation("/s"))
 UNIT_BYTES_PER_SECOND = Unit(IECNotation("B/s"))
 UNIT_NUMBER = Unit(DecimalNotation(""), StrictPrecision(2))
+UNIT_SECONDS = Unit(TimeNotation())
+UNIT_COUNT = Unit(DecimalNotation(""), StrictPrecision(0))
 
 
 metric_total_iops = Metric(
@@ -121,8 +123,118 @@ graph_data_reduction = Graph(
 )
 
 
+metric_physical_growth = Metric(
+    name="physical_growth",
+    title=Title("Growth of the used space per day"),
+    unit=UNIT_BYTES,
+    color=Color.BROWN,
+)
+
+graph_physical_growth = Graph(
+    name="physical_growth",
+    title=Title("Growth of the used space per day"),
+    simple_lines=(
+        "physical_growth",
+    ),
+)
+
+metric_physical_days_until_full = Metric(
+    name="physical_days_until_full",
+    title=Title("Days until full"),
+    unit=UNIT_NUMBER,
+    color=Color.DARK_RED,
+)
+
+graph_physical_days_until_full = Graph(
+    name="physical_days_until_full",
+    title=Title("Days until full"),
+    simple_lines=(
+        "physical_days_until_full",
+        WarningOf("physical_days_until_full"),
+        CriticalOf("physical_days_until_full"),
+    ),
+)
+
+
 perfometer_physical_percent = Perfometer(
     name="physical_used_percent",
     focus_range=FocusRange(Closed(0), Closed(100)),
     segments=("physical_used_percent",),
 )
+
+
+metric_dell_powerstore_agent_wall_time = Metric(
+    name="dell_powerstore_agent_wall_time",
+    title=Title("Agent run time"),
+    unit=UNIT_SECONDS,
+    color=Color.BLUE,
+)
+
+metric_dell_powerstore_agent_cpu_time = Metric(
+    name="dell_powerstore_agent_cpu_time",
+    title=Title("Agent CPU time"),
+    unit=UNIT_SECONDS,
+    color=Color.ORANGE,
+)
+
+metric_dell_powerstore_agent_write_time = Metric(
+    name="dell_powerstore_agent_write_time",
+    title=Title("Agent time writing the sections"),
+    unit=UNIT_SECONDS,
+    color=Color.LIGHT_GREEN,
+)
+
+graph_dell_powerstore_agent_time = Graph(
+    name="dell_powerstore_agent_time",
+    title=Title("Agent run time"),
+    simple_lines=(
+        "dell_powerstore_agent_wall_time",
+        "dell_powerstore_agent_cpu_time",
+        "dell_powerstore_agent_write_time",
+    ),
+)
+
+metric_dell_powerstore_agent_requests = Metric(
+    name="dell_powerstore_agent_requests",
+    title=Title("Agent REST API requests"),
+    unit=UNIT_COUNT,
+    color=Color.CYAN,
+)
+
+graph_dell_powerstore_agent_requests = Graph(
+    name="dell_powerstore_agent_requests",
+    title=Title("Agent REST API requests"),
+    simple_lines=(
+        "dell_powerstore_agent_requests",
+    ),
+)
+
+metric_dell_powerstore_agent_received = Metric(
+    name="dell_powerstore_agent_received",
+    title=Title("Agent data received"),
+    unit=UNIT_BYTES,
+    color=Color.PURPLE,
+)
+
+graph_dell_powerstore_agent_received = Graph(
+    name="dell_powerstore_agent_received",
+    title=Title("Agent data received"),
+    simple_lines=(
+        "dell_powerstore_agent_received",
+    ),
+)
+
+metric_dell_powerstore_agent_peak_rss = Metric(
+    name="dell_powerstore_agent_peak_rss",
+    title=Title("Agent peak memory"),
+    unit=UNIT_BYTES,
+    color=Color.DARK_GREEN,
+)
+
+graph_dell_powerstore_agent_peak_rss = Graph(
+    name="dell_powerstore_agent_peak_rss",
+    title=Title("Agent peak memory"),
+    simple_lines=(
+        "dell_powerstore_agent_peak_rss",
+    ),
+)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""REST API client of the Dell PowerStore special agent
+
+Only imported by the agent when it talks to the array, requests and urllib3
+are not loaded by runs served from the spool of the collector.
+"""
+
+# License: GNU General Public License v2
+
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import logging
+import math
+import random
+import socket
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+from requests.sessions import Session
+import urllib3
+from urllib3.connection import HTTPConnection
+from urllib3.util.request import ACCEPT_ENCODING
+
+
+LOGGER = logging.getLogger("agent_dell_powerstore")
+
+
+# .
+#   .--Connection----------------------------------------------------------.
+#   |             ____                       _   _                         |
+#   |            / ___|___  _ __  _ __   ___| |_(_) ___  _ __              |
+#   |           | |   / _ \| '_ \| '_ \ / _ \ __| |/ _ \| '_ \             |
+#   |           | |__| (_) | | | | | | |  __/ |_| | (_) | | | |            |
+#   |            \____\___/|_| |_|_| |_|\___|\__|_|\___/|_| |_|            |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+
+class DPSUnauthorized(RuntimeError):
+    """ 401 Unauthorized """
+    pass
+
+class DPSForbidden(RuntimeError):
+    """ 403 Forbidden """
+    pass
+
+class DPSUndecoded(RuntimeError):
+    """ XXX Undecoded """
+    pass
+
+class DPSDeadline(RuntimeError):
+    """ the deadline of the collection passed """
+    pass
+
+class DPSUnavailable(DPSUndecoded):
+    """ 429 Too Many Requests, 502, 503, 504 """
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# the status codes of a busy or restarting management plane, worth a retry
+RETRY_STATUS = (429, 502, 503, 504)
+RETRY_BACKOFF_MAX = 30.0
+
+
+class TokenBucket:
+    """client-side rate limit of the requests with an adaptive rate
+
+    Throttling answers of the array halve the rate, down to a tenth of the
+    configured one, every successful request restores a bit of it.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self._max_rate = rate
+        self.rate = rate
+        self._burst = max(burst, 1)
+        self._tokens = float(self._burst)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self) -> None:
+        with self._lock:
+            self.rate = max(self.rate / 2, self._max_rate / 10)
+
+    def succeeded(self) -> None:
+        with self._lock:
+            self.rate = min(self.rate + self._max_rate / 20, self._max_rate)
+
+
+class DPSAdapter(HTTPAdapter):
+    """HTTPS adapter keeping idle connections to the array alive by TCP keep-alive"""
+
+    SOCKET_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+        (socket.IPPROTO_TCP, getattr(socket, name), value)
+        for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+        if hasattr(socket, name)
+    ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+    def connections(self) -> int:
+        """the number of connections, i.e. TLS handshakes, opened so far"""
+        pools = self.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+
+class DPSSession(Session):
+    """Encapsulates the Sessions with the Dell PowerStore system"""
+
+    def __init__(self, address, port, verify='/etc/ssl/certs/ca-certificates.crt',
+                 user=None, secret=None, max_workers=1, page_size=None,
+                 rate_limit=None, retries=0, retry_backoff=0.5, timeout=None):
+        super(DPSSession, self).__init__()
+        self.verify = verify
+        # network timeout of every request in seconds, else the socket default timeout
+        self._timeout = timeout
+        # (call, urlsubd, status, seconds, bytes, bytes on the wire) of every request
+        self.timings = []
+        # One pooled connection per request in flight, the session is shared by all
+        # threads. The connections are reused for all requests of the run, and by the
+        # collector across runs, so the TLS handshake is done once per connection.
+        max_workers = max(max_workers, 1)
+        self._adapter = DPSAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.mount("https://", self._adapter)
+        self._connections_base = 0
+        # The semaphore limits the requests in flight, the fan-out pool runs requests
+        # like the pages of paginated collections for callers waiting for them.
+        self._in_flight = threading.BoundedSemaphore(max_workers)
+        self._fanout_pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._max_workers = max_workers
+        self._page_size = page_size
+        self._rate = TokenBucket(rate_limit, max_workers) if rate_limit else None
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+        if not self.verify:
+            # Watch out: we must provide the verify keyword to every individual request call!
+            # Else it will be overwritten by the REQUESTS_CA_BUNDLE env variable
+            urllib3.disable_warnings(category=urllib3.exceptions.InsecureRequestWarning)
+
+        self._rest_api_url = f"https://{address}:{port}/api/rest"
+        self.headers.update({
+            "Accept": "application/json",
+            # gzip and deflate, br and zstd if the decoders are installed
+            "Accept-Encoding": ACCEPT_ENCODING,
+            "User-Agent": "Checkmk special agent for Dell PowerStore",
+        })
+        # Basic auth is sent with the login_session request only, further requests
+        # are authenticated by the auth_cookie and the DELL-EMC-TOKEN header.
+        self._login_auth = None
+        if user is not None and secret is not None:
+            self._login_auth = HTTPBasicAuth(user, secret)
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+
+    def login(self):
+        """create a new login session"""
+        self.cookies.clear()
+        self._request_retried(self.get, "login_session", auth=self._login_auth)
+        self._login_generation += 1
+
+    def restore(self, state) -> bool:
+        """reuse the auth cookie and CSRF token of a previous login session"""
+        if not state or not state.get("cookies") or not state.get("csrf_token"):
+            return False
+        self.cookies.update(state["cookies"])
+        self.csrf_token = state["csrf_token"]
+        return True
+
+    def connections(self) -> int:
+        """the connections opened since the statistics were reset"""
+        return self._adapter.connections() - self._connections_base
+
+    def reset_stats(self) -> None:
+        self.timings.clear()
+        self._connections_base = self._adapter.connections()
+
+    def state(self):
+        return {"cookies": self.cookies.get_dict(), "csrf_token": getattr(self, "csrf_token", None)}
+
+    def query(self, method, urlsubd, raw=False, **kwargs):
+        """the decoded JSON reply, the undecoded body of a 200 reply if raw is set"""
+        if raw:
+            return self._request(method, urlsubd, **kwargs).content
+        pages = list(self.query_pages(method, urlsubd, **kwargs))
+        if len(pages) == 1:
+            return pages[0]
+        return list(itertools.chain.from_iterable(pages))
+
+    def query_pages(self, method, urlsubd, **kwargs):
+        """the pages of a collection in order
+
+        The pages are fetched concurrently, at most max_workers of them are
+        requested ahead of the page the caller is processing.
+        """
+        response = self._request(method, urlsubd, **kwargs)
+        page = response.json()
+        if response.status_code == 200:
+            yield page
+            return
+        # 206 Partial Content, the first page tells the total length of the collection
+        istart, iend, clen = _content_range(response)
+        del response
+        page_size = self._page_size or iend - istart + 1
+        windows = ((i, min(i + page_size, clen) - 1) for i in range(iend + 1, clen, page_size))
+        pending = collections.deque(
+                self._fanout_pool.submit(self._query_range, method, urlsubd, *w, **kwargs)
+                for w in itertools.islice(windows, self._max_workers))
+        yield page
+        del page
+        while pending:
+            pages = pending.popleft().result()
+            for w in itertools.islice(windows, 1):
+                pending.append(self._fanout_pool.submit(
+                        self._query_range, method, urlsubd, *w, **kwargs))
+            while pages:
+                yield pages.pop(0)
+
+    def _query_range(self, method, urlsubd, first, last, **kwargs):
+        """get the items first..last of a collection as a list of pages"""
+        pages = []
+        while first <= last:
+            headers = {**kwargs.get('headers', {}), "Range": f"{first}-{last}"}
+            response = self._request(method, urlsubd, **{**kwargs, 'headers': headers})
+            pages.append(response.json())
+            if response.status_code == 200:
+                break
+            # the array may return less than asked for, continue with the rest
+            first = _content_range(response)[1] + 1
+        return pages
+
+    def _request(self, method, urlsubd, deadline=None, **kwargs):
+        generation = self._login_generation
+        try:
+            return self._request_retried(method, urlsubd, deadline, **kwargs)
+        except DPSUnauthorized:
+            if self._login_auth is None:
+                raise
+        # The session expired or was terminated on the array, log in again. Concurrent
+        # workers hitting the same 401 share a single new login.
+        with self._login_lock:
+            if generation == self._login_generation:
+                LOGGER.info("login session expired, logging in again")
+                self.login()
+        return self._request_retried(method, urlsubd, deadline, **kwargs)
+
+    def _request_retried(self, method, urlsubd, deadline=None, **kwargs):
+        """retry GET and metrics requests on transient errors with exponential backoff
+
+        No request is started after the deadline, a time.monotonic() value.
+        """
+        retries = self._retries
+        if method != self.get and urlsubd != 'metrics/generate':
+            retries = 0
+        for attempt in itertools.count():
+            try:
+                return self._request_once(method, urlsubd, deadline, **kwargs)
+            except (DPSUnavailable, RequestsConnectionError, Timeout) as exc:
+                if attempt >= retries:
+                    raise
+                # full jitter, but not shorter than the array asked for
+                delay = random.uniform(0, min(self._retry_backoff * 2**attempt,
+                                              RETRY_BACKOFF_MAX))
+                delay = min(max(delay, getattr(exc, 'retry_after', None) or 0),
+                            RETRY_BACKOFF_MAX)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                LOGGER.warning("%s failed (%s), retry %d of %d in %.1fs",
+                               urlsubd, exc, attempt + 1, retries, delay)
+                time.sleep(delay)
+
+    def _request_once(self, method, urlsubd, deadline=None, **kwargs):
+        if hasattr(self, 'csrf_token'):
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'DELL-EMC-TOKEN': self.csrf_token}
+        call = _call_name(urlsubd, kwargs.get('json'))
+        if self._rate is not None:
+            self._rate.acquire()
+        # the request must neither wait for a slot nor run beyond the deadline
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if (timeout is not None and timeout <= 0) or not self._in_flight.acquire(timeout=timeout):
+            raise DPSDeadline(f"deadline passed before {urlsubd}")
+        try:
+            t0 = time.monotonic()
+            request_timeout = self._timeout or socket.getdefaulttimeout()
+            if deadline is not None:
+                kwargs['timeout'] = min(request_timeout or math.inf, max(deadline - t0, 0.1))
+            elif request_timeout:
+                kwargs['timeout'] = request_timeout
+            try:
+                response = method(self._rest_api_url + '/' + urlsubd, **kwargs,
+                                  verify=self.verify)
+            except (RequestsConnectionError, Timeout):
+                self.timings.append((call, urlsubd, 0, time.monotonic() - t0, 0, 0))
+                raise
+            self.timings.append((call, urlsubd, response.status_code, time.monotonic() - t0,
+                                 len(response.content), response.raw.tell()))
+        finally:
+            self._in_flight.release()
+        if 'DELL-EMC-TOKEN' in response.headers:
+            self.csrf_token = response.headers['DELL-EMC-TOKEN']
+        if response.status_code in (200, 206):
+            if self._rate is not None:
+                self._rate.succeeded()
+            return response
+        if response.status_code == 401:
+            raise DPSUnauthorized("401 Unauthorized")
+        if response.status_code == 403:
+            raise DPSForbidden("403 Forbidden")
+        if response.status_code in RETRY_STATUS:
+            if self._rate is not None and response.status_code in (429, 503):
+                self._rate.throttled()
+            retry_after = response.headers.get('Retry-After', '')
+            raise DPSUnavailable(f"{response.status_code} {response.reason}",
+                                 float(retry_after) if retry_after.isdigit() else None)
+        raise DPSUndecoded(f"{response.status_code} Undecoded status code")
+
+    def query_get(self, urlsubd, **kwargs):
+        return self.query(self.get, urlsubd, **kwargs)
+
+    def query_get_pages(self, urlsubd, **kwargs):
+        return self.query_pages(self.get, urlsubd, **kwargs)
+
+    def query_post_json(self, urlsubd, json, **kwargs):
+        return self.query(self.post, urlsubd, json=json, **kwargs)
+
+    def map(self, fn, *iterables):
+        """run fn concurrently for the items, the callers wait for the results"""
+        return self._fanout_pool.map(fn, *iterables)
+
+    def close(self):
+        self._fanout_pool.shutdown(cancel_futures=True)
+        super(DPSSession, self).close()
+
+
+def _call_name(urlsubd, body):
+    """the REST call of a request, e.g. 'volume' or 'metrics/generate space_metrics_by_appliance'"""
+    name = urlsubd.split('?', 1)[0]
+    if isinstance(body, dict) and 'entity' in body:
+        name = f"{name} {body['entity']}"
+    return name
+
+
+def _content_range(response):
+    """decode the Content-Range header, e.g. '0-99/1234', to (0, 99, 1234)"""
+    crd, clen = response.headers['Content-Range'].split('/', 1)
+    istart, iend = crd.split('-', 1)
+    return int(istart), int(iend), int(clen)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- encoding: utf-8; py-indent-offset: 4 -*-
+"""REST API fields of the dell_powerstore sections read by the check plugins"""
+
+# License: GNU General Public License v2
+
+# The special agent asks the REST API for the union of the fields declared here
+# instead of select=*. Plugins reading a new field have to declare it, else the
+# field is missing in the agent output. The fields the agent itself needs to
+# collect the metrics are declared for agent_dell_powerstore.
+
+SECTION_FIELDS: dict[str, dict[str, tuple[str, ...]]] = {
+    "appliance": {
+        "dell_powerstore_appliance": ("id", "name", "model", "node_count", "service_tag"),
+    },
+    "hardware": {
+        "dell_powerstore_hardware": (
+            "id",
+            "name",
+            "type",
+            "slot",
+            "parent_id",
+            "appliance_id",
+            "lifecycle_state",
+            "stale_state",
+            "extra_details",
+        ),
+    },
+    "volume": {
+        "dell_powerstore_volume": (
+            "appliance_id", "name", "type", "state", "size", "logical_used",
+        ),
+        "agent_dell_powerstore": ("id", "name", "type"),
+    },
+    "node": {
+        "agent_dell_powerstore": ("id", "name", "appliance_id"),
+    },
+    "fc_port": {
+        "agent_dell_powerstore": ("id", "name", "appliance_id", "node_id"),
+    },
+}
+
+
+def select(collection: str) -> str:
+    """the select= query parameter for a collection"""
+    fields = set()
+    for plugin_fields in SECTION_FIELDS.get(collection, {}).values():
+        fields.update(plugin_fields)
+    return ",".join(sorted(fields)) or "*"
@@ -4,24 +4,253 @@
 
 # License: GNU General Public License v2
 
+import datetime
 import json
 from typing import Any, Dict, NamedTuple, Optional, Tuple
 from cmk.agent_based.v2 import AgentSection, DiscoveryResult, Service, StringTable
 
+# use a faster JSON decoder when one is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _JSON_ERRORS: Tuple[type[Exception], ...] = (ValueError,)
+except ImportError:
+    try:
+        import msgspec
+        _json_loads = msgspec.json.decode
+        _JSON_ERRORS = (ValueError, msgspec.DecodeError)
+    except ImportError:
+        _json_loads = json.loads
+        _JSON_ERRORS = (ValueError,)
+
 
 DellPowerStoreAPIData = Dict[str, object]
 
 
+def _load(string_table: StringTable):
+    """the decoded line of a section, None if it is not valid"""
+    try:
+        if len(string_table) == 1 and len(string_table[0]) == 1:
+            # the agent writes a section as a single line
+            return _json_loads(string_table[0][0])
+        return _json_loads("".join("".join(x) for x in string_table))
+    except (IndexError,) + _JSON_ERRORS:
+        return None
+
+
+def _is_compact(data) -> bool:
+    """if the section is in the compact encoding of the agent option --compact
+
+    {"rows": [...], "fields": [...], "strings": {...}}: A row is the list of the
+    values of the fields, or an object. The values of interned fields are indexes
+    into the strings of the field.
+    """
+    return isinstance(data, dict) and "fields" in data and "rows" in data
+
+
+def _columns(data, fields) -> list:
+    """the values of the fields of the list rows of a compact section, by field
+
+    The values of a field missing in the section are None.
+    """
+    index = {f: k for k, f in enumerate(data["fields"])}
+    strings = data.get("strings", {})
+    columns = list(zip(*(row for row in data["rows"] if not isinstance(row, dict))))
+    if not columns:
+        return [()] * len(fields)
+    wanted = []
+    for f in fields:
+        if f not in index:
+            wanted.append([None] * len(columns[0]))
+            continue
+        column = columns[index[f]]
+        if f in strings:
+            table = strings[f]
+            column = [None if v is None else table[v] for v in column]
+        wanted.append(column)
+    return wanted
+
+
 def parse_dell_powerstore(string_table: StringTable) -> DellPowerStoreAPIData:
     """parse one line of data to dictionary"""
-    try:
-        section = json.loads("".join("".join(x) for x in string_table))
-        return section
-    except (IndexError, json.decoder.JSONDecodeError):
+    data = _load(string_table)
+    if data is None:
         return {}
+    if _is_compact(data):
+        expanded = iter([dict(zip(data["fields"], values))
+                         for values in zip(*_columns(data, data["fields"]))])
+        return [row if isinstance(row, dict) else next(expanded) for row in data["rows"]]
+    return data
+
+
+def _records(string_table: StringTable, fields):
+    """the values of the fields of every row, without building the rows of a compact section
+
+    The value of a field missing in a row is None.
+    """
+    data = _load(string_table)
+    if data is None:
+        return []
+    if _is_compact(data):
+        records = list(zip(*_columns(data, fields)))
+        records += [tuple(d.get(f) for f in fields) for d in data["rows"] if isinstance(d, dict)]
+        return records
+    return [tuple(d.get(f) for f in fields) for d in data]
+
+
+def _int(value) -> Optional[int]:
+    """the value as int, None if it is missing or no number"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _latest_by(section, key) -> Dict[str, dict]:
+    """the latest metrics sample of every item, the samples are sorted by time"""
+    latest = {}
+    for d in section:
+        k = key(d)
+        if k is not None:
+            latest[k] = d
+    return latest
+
+
+def _timestamp(ts: str) -> datetime.datetime:
+    return datetime.datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(
+            tzinfo=datetime.timezone.utc)
+
+
+class DellPowerStoreAppliance(NamedTuple):
+    name: Optional[str]
+    model: str
+    node_count: Any
+    service_tag: str
+
+
+DellPowerStoreAppliances = Dict[str, DellPowerStoreAppliance]
+
+
+def parse_dell_powerstore_appliance(string_table: StringTable) -> DellPowerStoreAppliances:
+    """appliances by id"""
+    return {
+        d['id']: DellPowerStoreAppliance(
+            d.get('name'),
+            d.get('model', 'unknown'),
+            d.get('node_count', 'unknown'),
+            d.get('service_tag', 'unknown'),
+        )
+        for d in parse_dell_powerstore(string_table)
+        if 'id' in d
+    }
+
+
+class DellPowerStoreSpace(NamedTuple):
+    timestamp: datetime.datetime
+    physical_total: int
+    physical_used: int
+    data_reduction: float
+    # (timestamp in seconds, physical_used) of all samples of the section
+    samples: Tuple[Tuple[float, int], ...] = ()
+
+
+DellPowerStoreSpaces = Dict[str, DellPowerStoreSpace]
+
+
+def parse_dell_powerstore_space(string_table: StringTable) -> DellPowerStoreSpaces:
+    """the latest space metrics by appliance id, with the used space of all samples"""
+    section = parse_dell_powerstore(string_table)
+    latest = _latest_by(section, lambda d: d.get('appliance_id'))
+    samples: Dict[str, list] = {}
+    for d in section:
+        if 'appliance_id' in d:
+            samples.setdefault(d['appliance_id'], []).append(
+                    (_timestamp(d['timestamp']).timestamp(), int(d['physical_used'])))
+    return {
+        app_id: DellPowerStoreSpace(
+            _timestamp(d['timestamp']),
+            int(d['physical_total']),
+            int(d['physical_used']),
+            float(d['data_reduction']),
+            tuple(samples[app_id]),
+        )
+        for app_id, d in latest.items()
+    }
+
+
+class DellPowerStorePerformance(NamedTuple):
+    timestamp: datetime.datetime
+    total_iops: float
+    total_bandwidth: float
+    # of samples collected in turns: when it was collected, the time between two
+    # collections in seconds
+    collected: Optional[float] = None
+    refresh: Optional[float] = None
+
+
+DellPowerStorePerformances = Dict[str, DellPowerStorePerformance]
+
+
+def _parse_performance(string_table: StringTable, key) -> DellPowerStorePerformances:
+    latest = _latest_by(parse_dell_powerstore(string_table), key)
+    return {
+        item: DellPowerStorePerformance(
+            _timestamp(d['timestamp']),
+            float(d['total_iops']),
+            float(d['total_bandwidth']),
+            d.get('collected'),
+            d.get('refresh'),
+        )
+        for item, d in latest.items()
+    }
+
+
+def parse_dell_powerstore_performance_by_appliance(
+        string_table: StringTable) -> DellPowerStorePerformances:
+    """the latest performance metrics by appliance id"""
+    return _parse_performance(string_table, lambda d: d.get('appliance_id'))
+
+
+def parse_dell_powerstore_performance_by_name(
+        string_table: StringTable) -> DellPowerStorePerformances:
+    """the latest performance metrics by the name of the node or port"""
+    return _parse_performance(string_table, lambda d: d.get('name'))
+
+
+def parse_dell_powerstore_performance_by_volume(
+        string_table: StringTable) -> DellPowerStorePerformances:
+    """the latest performance metrics by the item of the volume, 'appliance_id name'"""
+    return _parse_performance(
+            string_table,
+            lambda d: f"{d['appliance_id']} {d['name']}" if 'appliance_id' in d and 'name' in d else None)
+
+
+class DellPowerStoreVolume(NamedTuple):
+    name: str
+    appliance_id: str
+    type: Optional[str]
+    state: Optional[str]
+    # None if missing, e.g. logical_used of snapshots may be null
+    size: Optional[int]
+    logical_used: Optional[int]
+
+
+DellPowerStoreVolumes = Dict[Tuple[str, str], DellPowerStoreVolume]
+
+
+def parse_dell_powerstore_volume(string_table: StringTable) -> DellPowerStoreVolumes:
+    """volumes by (appliance_id, name), volumes without either are skipped"""
+    return {
+        (appliance_id, name): DellPowerStoreVolume(
+            name, appliance_id, type_, state, _int(size), _int(logical_used))
+        for name, appliance_id, type_, state, size, logical_used in _records(
+            string_table, DellPowerStoreVolume._fields)
+        if name is not None and appliance_id is not None
+    }
 
 
 def parse_dell_powerstore_hardware(string_table: StringTable) -> DellPowerStoreAPIData:
+    """hardware components by their path in the component tree"""
     section = parse_dell_powerstore(string_table)
 
     by_id = { x['id']: x for x in section }
@@ -29,19 +258,98 @@ def parse_dell_powerstore_hardware(string_table: StringTable) -> DellPowerStoreA
     def _short_cut(d: dict) -> str:
         t = d['type']
         sc = t if len(t) <= 10 else ''.join(c for c in t if c.isupper() or c.isdigit())
-        sc += f":{int(d['slot']):02d}"
+        sc += f":{int(d['slot'] or 0):02d}"
         n = d['name']
         ns = n.split('-')
         if len(ns) > 1:
             scn = ns[-1]
-            if scn[-1].isdigit() and not scn[-2].isdigit():
+            if len(scn) > 1 and scn[-1].isdigit() and not scn[-2].isdigit():
                 scn = scn[0:-1] + ':0' + scn[-1]
             if len(scn) +2 <= len(sc):
                 return scn
         return sc
 
-    def _hw_path(d: dict) -> str:
-        sc = _short_cut(d)
-        return _hw_path(by_id[d['parent_id']]) + '/' + sc if d['parent_id'] else d['appliance_id']
+    # Every path is computed once, walking up to the first component with a known
+    # path. A component with a missing parent or within a cycle is put directly
+    # below its appliance.
+    paths: Dict[str, str] = {}
+    for d in section:
+        chain = []
+        on_chain = set()
+        node = d
+        while node['id'] not in paths:
+            if not node['parent_id']:
+                paths[node['id']] = node['appliance_id']
+                break
+            parent = by_id.get(node['parent_id'])
+            if parent is None or parent is node or parent['id'] in on_chain:
+                paths[node['id']] = node['appliance_id'] + '/' + _short_cut(node)
+                break
+            chain.append(node)
+            on_chain.add(node['id'])
+            node = parent
+        for node in reversed(chain):
+            paths[node['id']] = paths[node['parent_id']] + '/' + _short_cut(node)
+
+    return { paths[x['id']]: x for x in section }
+
+
+class DellPowerStoreAgentCall(NamedTuple):
+    requests: int
+    seconds: float
+    max_seconds: float
+    bytes: int
+    status: Dict[str, int]
+
+
+class DellPowerStoreAgentStats(NamedTuple):
+    wall_time: float
+    write_time: float
+    # None if not reported, as by the collector
+    cpu_time: Optional[float]
+    peak_rss: Optional[int]
+    connections: int
+    calls: Dict[str, DellPowerStoreAgentCall]
+    failed: Dict[str, str]
+    stale: Dict[str, float]
+
+
+def parse_dell_powerstore_agent_stats(
+        string_table: StringTable) -> Optional[DellPowerStoreAgentStats]:
+    """the cost of the runs of the special agent, the REST calls by name
 
-    return { _hw_path(x): x for x in section }
+    Agent calls limited to different sections write a line each, their
+    costs are added up. The run time is the one of the slowest call.
+    """
+    runs = []
+    for line in string_table:
+        try:
+            runs.append(_json_loads(line[0]))
+        except (IndexError,) + _JSON_ERRORS:
+            continue
+    if not runs:
+        return None
+    calls: Dict[str, DellPowerStoreAgentCall] = {}
+    for d in runs:
+        for c in d.get('calls', []):
+            prev = calls.get(c['call'], DellPowerStoreAgentCall(0, 0.0, 0.0, 0, {}))
+            status = dict(prev.status)
+            for code, n in c['status'].items():
+                status[code] = status.get(code, 0) + n
+            calls[c['call']] = DellPowerStoreAgentCall(
+                prev.requests + int(c['requests']),
+                prev.seconds + float(c['seconds']),
+                max(prev.max_seconds, float(c['max_seconds'])),
+                prev.bytes + int(c['bytes']),
+                status,
+            )
+    return DellPowerStoreAgentStats(
+        max(float(d['wall_time']) for d in runs),
+        sum(float(d['write_time']) for d in runs),
+        sum(float(d['cpu_time']) for d in runs) if all('cpu_time' in d for d in runs) else None,
+        max(int(d['peak_rss']) for d in runs) if all('peak_rss' in d for d in runs) else None,
+        sum(int(d.get('connections', 0)) for d in runs),
+        calls,
+        {k: v for d in runs for k, v in d.get('failed', {}).items()},
+        {k: v for d in runs for k, v in d.get('stale', {}).items()},
+    )
@@ -4,14 +4,20 @@
 
 # License: GNU General Public License v2
 
-from cmk.rulesets.v1 import Title, Help
+from cmk.rulesets.v1 import Help, Label, Title
 from cmk.rulesets.v1.form_specs import (
     BooleanChoice,
     DefaultValue,
     DictElement,
     Dictionary,
+    Float,
     Integer,
+    List,
+    MultipleChoice,
+    MultipleChoiceElement,
     Password,
+    SingleChoice,
+    SingleChoiceElement,
     String,
     migrate_to_password,
     validators,
@@ -64,6 +70,235 @@ def _valuespec_special_agent_dell_powerstore() -> Dictionary:
                     custom_validate=(validators.NumberInRange(min_value=1, max_value=60),),
                 ),
             ),
+            "volume_performance": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Collect performance metrics of volumes"),
+                    help_text=Help(
+                        "Needs one REST API request per volume in every agent run."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "volume_shards": DictElement(
+                parameter_form=Integer(
+                    title=Title("Volume performance - Collect in turns"),
+                    help_text=Help(
+                        "Divides the volumes into this number of groups and collects the "
+                        "performance metrics of one group per agent run. The metrics of the "
+                        "other volumes are the ones of earlier runs, every volume is refreshed "
+                        "once in this number of runs."
+                    ),
+                    prefill=DefaultValue(4),
+                    custom_validate=(validators.NumberInRange(min_value=1, max_value=1000),),
+                ),
+            ),
+            "volume_budget": DictElement(
+                parameter_form=Integer(
+                    title=Title("Volume performance - Requests per run"),
+                    help_text=Help(
+                        "Maximal number of volume performance requests per agent run. The "
+                        "volumes are collected in as many turns as needed to stay within this "
+                        "number."
+                    ),
+                    prefill=DefaultValue(1000),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+            ),
+            "compact": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Compact encoding of large sections"),
+                    help_text=Help(
+                        "Writes the volume, hardware, volume performance and space metrics "
+                        "sections as value rows below a single header of field names, with "
+                        "repeated strings interned. This about halves the agent output of "
+                        "large arrays."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "piggyback": DictElement(
+                parameter_form=SingleChoice(
+                    title=Title("Piggyback hosts"),
+                    help_text=Help(
+                        "Write the data of the appliances and nodes as piggyback data for "
+                        "hosts named like the appliances and nodes, optionally also one "
+                        "host per volume, named like the appliance and the volume. This "
+                        "spreads the services of a large cluster."
+                    ),
+                    elements=[
+                        SingleChoiceElement(
+                            name="appliance",
+                            title=Title("Appliances and nodes"),
+                        ),
+                        SingleChoiceElement(
+                            name="volume",
+                            title=Title("Appliances, nodes and volumes"),
+                        ),
+                    ],
+                    prefill=DefaultValue("appliance"),
+                ),
+            ),
+            "max_workers": DictElement(
+                parameter_form=Integer(
+                    title=Title("Advanced - Concurrent requests"),
+                    help_text=Help(
+                        "Maximal number of REST API requests the special agent runs in parallel."
+                    ),
+                    prefill=DefaultValue(4),
+                    custom_validate=(validators.NumberInRange(min_value=1, max_value=32),),
+                ),
+            ),
+            "rate_limit": DictElement(
+                parameter_form=Float(
+                    title=Title("Advanced - Request rate limit"),
+                    help_text=Help(
+                        "Maximal number of REST API requests per second. The rate is lowered "
+                        "while the array signals overload and recovers afterwards."
+                    ),
+                    unit_symbol="/s",
+                    prefill=DefaultValue(20.0),
+                    custom_validate=(validators.NumberInRange(min_value=0.1),),
+                ),
+            ),
+            "retries": DictElement(
+                parameter_form=Integer(
+                    title=Title("Advanced - Retries of failed requests"),
+                    help_text=Help(
+                        "Number of retries of a read request failing with 429, 502, 503, 504, "
+                        "a timeout or a connection error. The retries wait exponentially "
+                        "growing, randomized times. Default is 3."
+                    ),
+                    prefill=DefaultValue(3),
+                    custom_validate=(validators.NumberInRange(min_value=0, max_value=10),),
+                ),
+            ),
+            "commands": DictElement(
+                parameter_form=List(
+                    title=Title("Split into parallel agent calls"),
+                    help_text=Help(
+                        "Run one special agent call per entry, each collecting only the "
+                        "selected sections with its own time budget, so a slow collection "
+                        "like the volumes does not delay the others. Sections not selected "
+                        "in any entry are not collected."
+                    ),
+                    add_element_label=Label("Add agent call"),
+                    element_template=Dictionary(
+                        elements={
+                            "sections": DictElement(
+                                parameter_form=MultipleChoice(
+                                    title=Title("Sections"),
+                                    elements=[
+                                        MultipleChoiceElement(name=name, title=title)
+                                        for name, title in (
+                                            ("check_mk", Title("Agent information")),
+                                            ("appliance", Title("Appliances")),
+                                            ("hardware", Title("Hardware")),
+                                            ("volume", Title("Volumes")),
+                                            ("performance_metrics_by_appliance",
+                                             Title("Performance metrics of appliances")),
+                                            ("performance_metrics_by_node",
+                                             Title("Performance metrics of nodes")),
+                                            ("performance_metrics_by_fe_fc_port",
+                                             Title("Performance metrics of FC ports")),
+                                            ("performance_metrics_by_volume",
+                                             Title("Performance metrics of volumes")),
+                                            ("space_metrics_by_appliance",
+                                             Title("Space metrics")),
+                                        )
+                                    ],
+                                    custom_validate=(validators.LengthInRange(min_value=1),),
+                                ),
+                                required=True,
+                            ),
+                            "run_budget": DictElement(
+                                parameter_form=Integer(
+                                    title=Title("Time budget of the call"),
+                                    unit_symbol="s",
+                                    prefill=DefaultValue(50),
+                                    custom_validate=(
+                                        validators.NumberInRange(min_value=1),
+                                    ),
+                                ),
+                            ),
+                        },
+                    ),
+                ),
+            ),
+            "section_intervals": DictElement(
+                parameter_form=Dictionary(
+                    title=Title("Collection intervals of sections"),
+                    help_text=Help(
+                        "Collect these sections only every given number of seconds, in "
+                        "between their last data is output as cached data. 0 collects a "
+                        "section in every run. Appliances and hardware default to 600 seconds."
+                    ),
+                    elements={
+                        name: DictElement(
+                            parameter_form=Integer(
+                                title=title,
+                                unit_symbol="s",
+                                prefill=DefaultValue(prefill),
+                                custom_validate=(validators.NumberInRange(min_value=0),),
+                            ),
+                        )
+                        for name, title, prefill in (
+                            ("appliance", Title("Appliances"), 600),
+                            ("hardware", Title("Hardware"), 600),
+                            ("volume", Title("Volumes"), 300),
+                            ("space_metrics_by_appliance", Title("Space metrics"), 300),
+                            ("performance_metrics_by_volume",
+                             Title("Performance metrics of volumes"), 300),
+                        )
+                    },
+                ),
+            ),
+            "run_budget": DictElement(
+                parameter_form=Integer(
+                    title=Title("Advanced - Time budget of the collection"),
+                    help_text=Help(
+                        "Seconds the special agent may spend collecting. Sections not "
+                        "collected in time are replaced by their last good data from the "
+                        "cache or left out, the other sections are still output. Keep it "
+                        "below the check interval. Default is 50 seconds."
+                    ),
+                    prefill=DefaultValue(50),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+            ),
+            "section_timeout": DictElement(
+                parameter_form=Integer(
+                    title=Title("Advanced - Time limit per section"),
+                    help_text=Help(
+                        "Seconds the collection of a single section may take within the "
+                        "time budget of the collection."
+                    ),
+                    prefill=DefaultValue(30),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+            ),
+            "replay_cache": DictElement(
+                parameter_form=BooleanChoice(
+                    title=Title("Replay the last good data of failed sections"),
+                    help_text=Help(
+                        "Keep the data of all sections in the cache, not only of the slowly "
+                        "changing ones, to output the last good data of a section whose "
+                        "collection failed or timed out."
+                    ),
+                    prefill=DefaultValue(False),
+                ),
+            ),
+            "from_spool": DictElement(
+                parameter_form=Integer(
+                    title=Title("Advanced - Use data of the collector"),
+                    help_text=Help(
+                        "Output the data a collector (agent_dell_powerstore --collector) "
+                        "wrote to its spool directory if it is not older than the given "
+                        "number of seconds. Outdated or missing data is collected directly."
+                    ),
+                    prefill=DefaultValue(180),
+                    custom_validate=(validators.NumberInRange(min_value=1),),
+                ),
+            ),
         },
     )
 
@@ -10,11 +10,14 @@ from cmk.rulesets.v1.form_specs import (
     DefaultValue,
     DictElement,
     Dictionary,
+    Float,
+    Integer,
     LevelDirection,
     Levels,
     LevelsConfigModel,
     Percentage,
     PredictiveLevels,
+    validators,
 )
 
 _NumberT = TypeVar("_NumberT", int, float)
@@ -29,6 +32,8 @@ class _Levels(TypedDict):
 
 class Params(TypedDict):
     capacity: _Levels
+    days_remaining: NotRequired[LevelsConfigModel[float]]
+    trend_days: NotRequired[int]
 
 
 def _perc_used_levels(title: Title, metric: str) -> Dictionary:
@@ -80,6 +85,29 @@ def _param_form_dell_power_store_space() -> Dictionary:
                     },
                 )
             ),
+            "days_remaining": DictElement(
+                parameter_form=Levels[float](
+                    title=Title("Lower levels on the time until full"),
+                    help_text=Help(
+                        "The time until full is forecast by the linear trend of the used "
+                        "space over the trend period."
+                    ),
+                    form_spec_template=Float(unit_symbol="days"),
+                    level_direction=LevelDirection.LOWER,
+                    prefill_fixed_levels=DefaultValue((30.0, 7.0)),
+                ),
+            ),
+            "trend_days": DictElement(
+                parameter_form=Integer(
+                    title=Title("Trend period"),
+                    help_text=Help(
+                        "Number of days of space usage history the trend is computed from."
+                    ),
+                    unit_symbol="days",
+                    prefill=DefaultValue(7),
+                    custom_validate=(validators.NumberInRange(min_value=1, max_value=90),),
+                ),
+            ),
         },
     )
 
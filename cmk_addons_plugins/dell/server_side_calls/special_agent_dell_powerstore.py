@@ -15,6 +15,12 @@ from cmk.server_side_calls.v1 import (
 )
 
 
+class Command(BaseModel):
+    """an agent call limited to some sections"""
+    sections: list[str]
+    run_budget: int | None = None
+
+
 class Params(BaseModel):
     """params validator"""
     user: str | None = None
@@ -22,6 +28,20 @@ class Params(BaseModel):
     cert_check: bool
     port: int | None = None
     timeout: int | None = None
+    max_workers: int | None = None
+    rate_limit: float | None = None
+    retries: int | None = None
+    run_budget: int | None = None
+    section_timeout: int | None = None
+    replay_cache: bool = False
+    section_intervals: dict[str, int] = {}
+    commands: list[Command] = []
+    volume_performance: bool = False
+    volume_shards: int | None = None
+    volume_budget: int | None = None
+    compact: bool = False
+    piggyback: str | None = None
+    from_spool: int | None = None
 
 
 def _agent_dell_powerstore_arguments(
@@ -36,10 +56,43 @@ def _agent_dell_powerstore_arguments(
         command_arguments += ["-p", str(params.port)]
     if params.timeout is not None:
         command_arguments += ["-t", str(params.timeout)]
+    if params.max_workers is not None:
+        command_arguments += ["--max-workers", str(params.max_workers)]
+    if params.rate_limit is not None:
+        command_arguments += ["--rate-limit", str(params.rate_limit)]
+    if params.retries is not None:
+        command_arguments += ["--retries", str(params.retries)]
+    if params.run_budget is not None:
+        command_arguments += ["--run-budget", str(params.run_budget)]
+    if params.section_timeout is not None:
+        command_arguments += ["--section-timeout", str(params.section_timeout)]
+    if params.replay_cache:
+        command_arguments += ["--replay-cache"]
+    for section, interval in sorted(params.section_intervals.items()):
+        command_arguments += ["--section-ttl", f"{section}={interval}"]
+    if params.volume_performance:
+        command_arguments += ["--volume-performance"]
+    if params.volume_shards is not None:
+        command_arguments += ["--volume-shards", str(params.volume_shards)]
+    if params.volume_budget is not None:
+        command_arguments += ["--volume-budget", str(params.volume_budget)]
+    if params.compact:
+        command_arguments += ["--compact"]
+    if params.piggyback is not None:
+        command_arguments += ["--piggyback", params.piggyback]
+    if params.from_spool is not None:
+        command_arguments += ["--from-spool", str(params.from_spool)]
     if not params.cert_check:
         command_arguments += ["--no-cert-check"]
-    command_arguments.append(host_config.primary_ip_config.address or host_config.name)
-    yield SpecialAgentCommand(command_arguments=command_arguments)
+    address = host_config.primary_ip_config.address or host_config.name
+    if not params.commands:
+        yield SpecialAgentCommand(command_arguments=command_arguments + [address])
+        return
+    for command in params.commands:
+        arguments = command_arguments + ["--sections", ",".join(command.sections)]
+        if command.run_budget is not None:
+            arguments += ["--run-budget", str(command.run_budget)]
+        yield SpecialAgentCommand(command_arguments=arguments + [address])
 
 
 special_agent_dell_powerstore = SpecialAgentConfig(
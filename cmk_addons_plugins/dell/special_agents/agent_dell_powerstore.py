@@ -9,19 +9,28 @@
 # https://www.dell.com/support/manuals/cs-cz/powerstore-500t/pwrstr-apidevg/managing-a-rest-api-session
 # https://dell.com/powerstoredocs
 
+# The REST API client with requests and urllib3 and the other modules only needed
+# to collect the data are imported where they are used. Runs served from the spool
+# of the collector and argument errors don't load them. The password store is
+# loaded by agent_common anyway.
 import argparse
+import io
 from collections.abc import Sequence
+import itertools
+import json
+import logging
+import math
 import os
-import re
-from requests.sessions import Session
-from requests.auth import HTTPBasicAuth
-import socket
+import resource
 import sys
-import tempfile
+import threading
+import time
+import zlib
 from pathlib import Path
-import urllib3
+from typing import TYPE_CHECKING
 
 from cmk.special_agents.v0_unstable.agent_common import (
+    ConditionalPiggybackSection,
     SectionWriter,
     special_agent_main,
 )
@@ -30,7 +39,15 @@ from cmk.special_agents.v0_unstable.argument_parsing import (
     create_default_argument_parser,
 )
 import cmk.utils.password_store
+import cmk.utils.paths
 
+from cmk_addons.plugins.dell.powerstore_fields import select
+
+if TYPE_CHECKING:
+    from cmk_addons.plugins.dell.powerstore_api import DPSSession
+
+
+LOGGER = logging.getLogger("agent_dell_powerstore")
 
 
 # .
@@ -49,6 +66,46 @@ def file_path(path):
     else:
         raise argparse.ArgumentTypeError(f"readable_file:{path} is not a valid path")
 
+# TTL of the cached section data in seconds, sections not listed are fetched on every run
+DEFAULT_SECTION_TTL = {
+    "check_mk": 86400,
+    "appliance": 600,
+    "hardware": 600,
+    "node": 600,
+    "fc_port": 600,
+}
+# the interval a section replayed from the cache is announced to be cached for
+CHECK_INTERVAL = 60
+
+# the sections of the agent in the order they are written
+SECTIONS = (
+    "check_mk",
+    "appliance",
+    "hardware",
+    "volume",
+    "performance_metrics_by_appliance",
+    "performance_metrics_by_node",
+    "performance_metrics_by_fe_fc_port",
+    "performance_metrics_by_volume",
+    "space_metrics_by_appliance",
+)
+
+
+def section_list(value):
+    names = [n.strip() for n in value.split(',') if n.strip()]
+    unknown = set(names) - set(SECTIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown sections: {', '.join(sorted(unknown))}")
+    return names
+
+
+def section_ttl(value):
+    name, sep, ttl = value.partition('=')
+    if not sep or not ttl.isdigit():
+        raise argparse.ArgumentTypeError(f"{value} is not in the form SECTION=SECONDS")
+    return name, int(ttl)
+
+
 def parse_arguments(argv: Sequence[str] | None) -> Args:
 
     parser = create_default_argument_parser(description=__doc__)
@@ -75,6 +132,126 @@ def parse_arguments(argv: Sequence[str] | None) -> Args:
         type=int,
         default=443,
         help="""Alternative port number (default is 443 for the https connection).""")
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=4,
+        help="""Maximal number of REST API requests running concurrently (default is 4).""")
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        metavar="REQ_PER_SEC",
+        help="""Maximal rate of REST API requests per second (default is no limit). The rate
+        is lowered while the array answers 429 or 503 and recovers afterwards.""")
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="""Number of retries of a GET or metrics request failing with 429, 502, 503,
+        504, a timeout or a connection error (default is 3).""")
+    parser.add_argument(
+        "--retry-backoff",
+        type=float,
+        default=0.5,
+        metavar="SECS",
+        help="""Base of the exponential backoff between retries with random jitter, the
+        n-th retry waits up to SECS * 2^n seconds, at most 30 seconds (default is 0.5).""")
+    parser.add_argument(
+        "--run-budget",
+        type=int,
+        default=50,
+        metavar="SECS",
+        help="""Time budget of the collection in seconds, 0 for none (default is 50). Sections
+        not collected within the budget are replaced by their cached data or left out.""")
+    parser.add_argument(
+        "--section-timeout",
+        type=int,
+        default=None,
+        metavar="SECS",
+        help="""Time limit of the collection of a single section in seconds (default is the
+        run budget).""")
+    parser.add_argument(
+        "--no-session-cache",
+        action="store_true",
+        help="""Do not reuse the login session of previous runs, log in every time.""")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=None,
+        help="""Number of items requested per page of a paginated collection (default is
+        the page size chosen by the array).""")
+    parser.add_argument(
+        "--volume-performance",
+        action="store_true",
+        help="""Collect the performance metrics of every primary volume as well. This costs
+        one metrics request per volume.""")
+    parser.add_argument(
+        "--volume-shards",
+        type=int,
+        default=1,
+        metavar="N",
+        help="""Collect the performance metrics of a volume only every N-th run, the volumes
+        are divided into N shards collected in turn. The latest metrics of the other shards
+        are taken from the section cache, which is required (default is 1).""")
+    parser.add_argument(
+        "--volume-budget",
+        type=int,
+        default=None,
+        metavar="REQUESTS",
+        help="""Maximal number of volume metrics requests per run, more volumes are divided
+        into as many shards as needed. Requires the section cache.""")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help=f"""Write the large sections ({", ".join(COMPACT_INTERNED)}) in a compact
+        columnar encoding, the field names once followed by the value rows with repeated
+        strings interned. Needs the check plugins of this version.""")
+    parser.add_argument(
+        "--piggyback",
+        choices=("appliance", "volume"),
+        default=None,
+        help="""Write the data of every appliance and node as piggyback data of a host
+        named like the appliance or node. With 'volume' every volume gets its own
+        piggyback host as well, named APPLIANCE-VOLUME with the characters not valid in
+        host names replaced by '_'.""")
+    parser.add_argument(
+        "--select-all",
+        action="store_true",
+        help="""Request all fields of the collections (select=*) instead of the fields used
+        by the check plugins. For debugging.""")
+    parser.add_argument(
+        "--sections",
+        type=section_list,
+        default=None,
+        metavar="SECTION,...",
+        help=f"""Collect and output only these sections, so the sections can be split among
+        several agent calls running in parallel (default is all of
+        {", ".join(SECTIONS)}).""")
+    parser.add_argument(
+        "--section-ttl",
+        type=section_ttl,
+        action="append",
+        default=[],
+        metavar="SECTION=SECONDS",
+        help=f"""Reuse the data of SECTION collected by a previous run for SECONDS. May be
+        given multiple times, 0 disables the caching of a section (default is
+        {", ".join(f"{k}={v}" for k, v in DEFAULT_SECTION_TTL.items())}).""")
+    parser.add_argument(
+        "--replay-cache",
+        action="store_true",
+        help="""Keep the data of every section in the cache, not only of the sections with a
+        TTL, so the last successfully collected data can be output if the collection of the
+        section fails or times out.""")
+    parser.add_argument(
+        "--cache-max-size",
+        type=int,
+        default=64,
+        help="""Size limit of the section cache directory in MiB (default is 64).""")
+    parser.add_argument(
+        "--no-section-cache",
+        action="store_true",
+        help="""Do not use the section cache at all.""")
 
     # optional arguments (from a coding point of view - should some of them be mandatory?)
     parser.add_argument("-u", "--user", default=None, help="""Username for login""")
@@ -91,91 +268,174 @@ def parse_arguments(argv: Sequence[str] | None) -> Args:
         help="""Password store reference to the password for login""",
     )
 
+    # collector
+    parser.add_argument(
+        "--collector",
+        type=file_path,
+        default=None,
+        metavar="CONFIG",
+        help="""Run as a long running collector polling the arrays listed in CONFIG and
+        keeping their latest agent output in the spool directory. Every line of CONFIG
+        holds the arguments of this special agent for one array, including its timeout.""")
+    parser.add_argument(
+        "--collector-interval",
+        type=int,
+        default=60,
+        help="""Seconds between two polls of an array by the collector (default is 60).""")
+    parser.add_argument(
+        "--spool-dir",
+        type=Path,
+        default=None,
+        help="""Spool directory of the collector (default is
+        tmp/check_mk/agents/agent_dell_powerstore/spool of the site).""")
+    parser.add_argument(
+        "--from-spool",
+        type=int,
+        default=None,
+        metavar="MAX_AGE",
+        help="""Output the agent data of the collector if it is not older than MAX_AGE
+        seconds, else collect the data directly.""")
+
     # positional arguments
     parser.add_argument("host_address",
                         metavar="HOST",
+                        nargs="?",
                         help="""Host name or IP address of Dell PowerStore""")
 
-    return parser.parse_args(argv)
+    args = parser.parse_args(argv)
+    if args.host_address is None and args.collector is None:
+        parser.error("the HOST argument is required")
+    if args.no_section_cache and (args.volume_shards > 1 or args.volume_budget):
+        parser.error("--volume-shards and --volume-budget need the section cache")
+    return args
 
 
 #.
-#   .--Connection----------------------------------------------------------.
-#   |             ____                       _   _                         |
-#   |            / ___|___  _ __  _ __   ___| |_(_) ___  _ __              |
-#   |           | |   / _ \| '_ \| '_ \ / _ \ __| |/ _ \| '_ \             |
-#   |           | |__| (_) | | | | | | |  __/ |_| | (_) | | | |            |
-#   |            \____\___/|_| |_|_| |_|\___|\__|_|\___/|_| |_|            |
+#   .--Cache---------------------------------------------------------------.
+#   |                                                                      |
+#   |                       ____           _                               |
+#   |                      / ___|__ _  ___| |__   ___                      |
+#   |                     | |   / _` |/ __| '_ \ / _ \                     |
+#   |                     | |__| (_| | (__| | | |  __/                     |
+#   |                      \____\__,_|\___|_| |_|\___|                     |
 #   |                                                                      |
 #   '----------------------------------------------------------------------'
 
 
-class DPSUnauthorized(RuntimeError):
-    """ 401 Unauthorized """
-    pass
+def _digest(text: str) -> str:
+    """the hex SHA-256 of a text, for the names of the cache files"""
+    import hashlib  # pylint: disable=import-outside-toplevel
 
-class DPSForbidden(RuntimeError):
-    """ 403 Forbidden """
-    pass
+    return hashlib.sha256(text.encode()).hexdigest()
 
-class DPSUndecoded(RuntimeError):
-    """ XXX Undecoded """
-    pass
 
+class DPSSessionCache:
+    """Keeps the auth cookie and CSRF token of a login session between agent runs"""
 
-class DPSSession(Session):
-    """Encapsulates the Sessions with the Dell PowerStore system"""
+    def __init__(self, address, port, user):
+        key = _digest(f"{address}:{port}:{user}")
+        self._path = (Path(cmk.utils.paths.tmp_dir) / "agents" / "agent_dell_powerstore"
+                      / f"session_{key[:32]}.json")
 
-    def __init__(self, address, port, verify='/etc/ssl/certs/ca-certificates.crt',
-                 user=None, secret=None):
-        super(DPSSession, self).__init__()
-        self.verify = verify
-        if not self.verify:
-            # Watch out: we must provide the verify keyword to every individual request call!
-            # Else it will be overwritten by the REQUESTS_CA_BUNDLE env variable
-            urllib3.disable_warnings(category=urllib3.exceptions.InsecureRequestWarning)
+    def load(self):
+        try:
+            with self._path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
 
-        self._rest_api_url = f"https://{address}:{port}/api/rest"
-        self.headers.update({
-            "Accept": "application/json",
-            "User-Agent": "Checkmk special agent for Dell PowerStore",
-        })
-        if user is not None and secret is not None:
-            self.auth = HTTPBasicAuth(user, secret)
-
-    def query(self, method, urlsubd, **kwargs):
-        if hasattr(self, 'csrf_token'):
-            kwargs.setdefault('headers', {})['DELL-EMC-TOKEN'] = self.csrf_token
-        response = method(self._rest_api_url + '/' + urlsubd, **kwargs, verify=self.verify)
-        self.csrf_token = response.headers['DELL-EMC-TOKEN']
-        if response.status_code == 200:
-            return response.json()
-        if response.status_code == 206:
-            json1 = response.json()
-            crange = response.headers['Content-Range']
-            crd, clen = crange.split('/', 1)
-            istart, iend = crd.split('-', 1)
-            clen = int(clen)
-            istart = int(istart)
-            iend = int(iend)
-            inext = iend +1
-            if inext < clen:
-                hdr = kwargs.get('headers', {})
-                hdr["Range"] = f"{inext}-"
-                kwargs['headers'] = hdr
-                json1.extend(self.query_get(urlsubd, **kwargs))
-            return json1
-        if response.status_code == 401:
-            raise DPSUnauthorized("401 Unauthorized")
-        if response.status_code == 403:
-            raise DPSForbidden("403 Forbidden")
-        raise DPSUndecoded(f"{response.status_code} Undecoded status code")
-
-    def query_get(self, urlsubd, **kwargs):
-        return self.query(self.get, urlsubd, **kwargs)
-
-    def query_post_json(self, urlsubd, json, **kwargs):
-        return self.query(self.post, urlsubd, json=json, **kwargs)
+    def store(self, state) -> None:
+        self._path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = self._path.with_suffix(f".{os.getpid()}.tmp")
+        # the cookie is as good as the password, nobody else may read it
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self._path)
+
+    def remove(self) -> None:
+        self._path.unlink(missing_ok=True)
+
+
+
+class SectionCache:
+    """Keeps the data of the sections between agent runs
+
+    Slowly changing sections are served from the cache while their TTL lasts,
+    the cached data may also be replayed when a fetch fails. The size of the
+    cache directory is bounded, the least recently written files are evicted.
+    The state of the runs, like the watermarks of the metrics, is kept in a
+    directory of its own that is never evicted.
+    """
+
+    def __init__(self, address, port, user, max_size):
+        base = Path(cmk.utils.paths.tmp_dir) / "agents" / "agent_dell_powerstore"
+        self._dir = base / "sections"
+        self._state_dir = base / "state"
+        self._key = _digest(f"{address}:{port}:{user}")[:32]
+        self._max_size = max_size
+
+    def _path(self, name, directory=None):
+        return (directory or self._dir) / f"{self._key}_{name}.json"
+
+    @staticmethod
+    def _read(path):
+        try:
+            with path.open() as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry["timestamp"], entry["data"]
+
+    def get(self, name, max_age=None):
+        """the (timestamp, data) of a section not older than max_age seconds"""
+        entry = self._read(self._path(name))
+        if entry is None or max_age is not None and time.time() - entry[0] > max_age:
+            return None
+        return entry
+
+    def put(self, name, data) -> None:
+        path = self._path(name)
+        self._write(path, data)
+        self._evict(keep=path)
+
+    def get_state(self, name):
+        """the run state kept under name, None if there is none"""
+        entry = self._read(self._path(name, self._state_dir))
+        return None if entry is None else entry[1]
+
+    def put_state(self, name, data) -> None:
+        self._write(self._path(name, self._state_dir), data)
+
+    @staticmethod
+    def _write(path, data) -> None:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            if isinstance(data, JsonArraySpool):
+                f.write(f'{{"timestamp": {time.time()}, "data": ')
+                data.write_to(f)
+                f.write('}')
+            else:
+                json.dump({"timestamp": time.time(), "data": data}, f)
+        os.replace(tmp, path)
+
+    def _evict(self, keep) -> None:
+        files = []
+        for path in self._dir.glob("*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(f[1] for f in files)
+        for _mtime, size, path in sorted(files):
+            if total <= self._max_size:
+                break
+            if path != keep:
+                path.unlink(missing_ok=True)
+                total -= size
 
 
 #.
@@ -189,44 +449,750 @@ class DPSSession(Session):
 #   '----------------------------------------------------------------------'
 
 
-def get_information(s: DPSSession, args: Args):
-    """get an information from the REST API interface"""
-
-    ainfo = s.query_get('openapi.json')['info']
-    with SectionWriter("check_mk", " ") as w:
-        w.append("Version: 2.0")
-        w.append(f"AgentOS: {ainfo['title']} {ainfo['version']}")
-
-    appliance = s.query_get('appliance?select=*')
-    with SectionWriter("appliance") as w:
-        w.append_json(appliance)
-
-    with SectionWriter("hardware") as w:
-        w.append_json(s.query_get('hardware?select=*'))
-
-    with SectionWriter("volume") as w:
-        w.append_json(s.query_get('volume?select=*'))
-
-#    with SectionWriter("performance_metrics_by_appliance") as w:
-#        d = []
-#        for app in appliance:
-#            d.append(s.query_post_json('metrics/generate', {
-#                      "entity": "performance_metrics_by_appliance",
-#                      "entity_id": app['id'],
-#                      "interval": "Best_Available"
-#                    })[-1])
-#        w.append_json(d)
-
-    with SectionWriter("space_metrics_by_appliance") as w:
-        d = []
-        for app in appliance:
-            d.append(s.query_post_json('metrics/generate', {
-                      "entity": "space_metrics_by_appliance",
-                      "entity_id": app['id'],
-                      "interval": "Best_Available"
-                    })[-1])
-        w.append_json(d)
+class JsonArraySpool:
+    """A JSON array written item by item as the pages of a collection arrive
+
+    The serialized items are kept line by line in a temporary file spooled to
+    disk when it grows, so a large collection never has to be held as Python
+    objects. The optional keep function selects what is kept in memory of every
+    item.
+    """
+
+    def __init__(self, keep=None):
+        import tempfile  # pylint: disable=import-outside-toplevel
+
+        self._file = tempfile.SpooledTemporaryFile(max_size=1024**2, mode="w+")
+        self._keep = keep
+        self.kept = []
+
+    def extend(self, items) -> None:
+        for item in items:
+            self._file.write(json.dumps(item, sort_keys=True))
+            self._file.write("\n")
+            if self._keep is not None:
+                kept = self._keep(item)
+                if kept is not None:
+                    self.kept.append(kept)
+
+    def __iter__(self):
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+
+    def write_to(self, out) -> None:
+        """write the array as a single line"""
+        self._file.seek(0)
+        out.write("[")
+        sep = ""
+        for line in self._file:
+            out.write(sep)
+            out.write(line[:-1])
+            sep = ", "
+        out.write("]\n")
+
+
+def _spooled(data, keep=None) -> JsonArraySpool:
+    """data of a section as a spool, data from the cache is a plain list"""
+    if isinstance(data, JsonArraySpool):
+        return data
+    spool = JsonArraySpool(keep)
+    spool.extend(data)
+    return spool
+
+
+# Sections written in the compact encoding with --compact, and their fields whose
+# strings are interned.
+COMPACT_INTERNED = {
+    "volume": ("appliance_id", "state", "type"),
+    "hardware": ("appliance_id", "lifecycle_state", "name", "parent_id", "stale_state", "type"),
+    "performance_metrics_by_volume": ("appliance_id", "entity"),
+    "space_metrics_by_appliance": ("appliance_id",),
+}
+
+
+def write_compact(out, rows, interned) -> None:
+    """write the rows as a single line {"rows": [...], "fields": [...], "strings": {...}}
+
+    The fields are the keys of the first row, every row with the same keys is
+    written as the list of its values. The values of the interned fields are
+    indexes into the strings of the field, or null. Any other row is written
+    as an object.
+    """
+    fields = None
+    strings = {f: {} for f in interned}
+    out.write('{"rows": [')
+    sep = ""
+    for row in rows:
+        if fields is None:
+            fields = sorted(row)
+            keys = set(fields)
+            columns = [strings.get(f) for f in fields]
+        values = None
+        if row.keys() == keys:
+            values = [row[f] for f in fields]
+            for k, table in enumerate(columns):
+                if table is None or values[k] is None:
+                    continue
+                if not isinstance(values[k], str):
+                    values = None
+                    break
+                values[k] = table.setdefault(values[k], len(table))
+        out.write(sep)
+        out.write(json.dumps(row, sort_keys=True) if values is None else json.dumps(values))
+        sep = ", "
+    out.write(f'], "fields": {json.dumps(fields or [])}, "strings": ')
+    out.write(json.dumps({f: list(table) for f, table in strings.items() if table}))
+    out.write("}\n")
+
+
+def _append_json(w: SectionWriter, data, interned=None) -> None:
+    if interned is not None:
+        write_compact(sys.stdout, data, interned)
+    elif isinstance(data, JsonArraySpool):
+        data.write_to(sys.stdout)
+    else:
+        w.append_json(data)
+
+
+def _write_section(name: str, data, host_of=None, cached=None, interned=None) -> None:
+    """write a section, split to piggyback hosts by host_of if given
+
+    Items without a piggyback host stay with the host of the agent. Data
+    collected at an earlier time is announced by cached=(timestamp, interval).
+    With interned fields the data is written in the compact encoding.
+    """
+    if cached is not None:
+        name = f"{name}:cached({int(cached[0])},{int(cached[1])})"
+    if host_of is None:
+        with SectionWriter(name) as w:
+            _append_json(w, data, interned)
+        return
+    parts = {}
+    for item in data:
+        parts.setdefault(host_of(item) or "", JsonArraySpool()).extend([item])
+    for host, part in parts.items():
+        with ConditionalPiggybackSection(host):
+            with SectionWriter(name) as w:
+                _append_json(w, part, interned)
+
+
+# The finest interval of the metrics and how long the array retains it. Samples newer
+# than the watermark are requested in this interval while the watermark is within
+# the retention, which bounds the reply, else as Best_Available.
+METRICS_INTERVAL = {
+    "space_metrics_by_appliance": ("Five_Mins", 86400),
+}
+PERFORMANCE_INTERVAL = ("Twenty_Sec", 3600)
+# Entities without a watermark get their history in this interval, all the samples
+# are output once to seed the trend of the check.
+METRICS_HISTORY = {
+    "space_metrics_by_appliance": "One_Hour",
+}
+
+
+def _rows_newer(content: bytes, watermark: str | None):
+    """the samples newer than the watermark decoded from the end of a metrics reply
+
+    The samples are flat objects sorted by time, only the new ones are decoded.
+    Without a watermark only the latest sample is returned.
+    """
+    rows = []
+    end = content.rfind(b'}')
+    try:
+        while end >= 0:
+            start = content.rfind(b'{', 0, end)
+            row = json.loads(content[start:end + 1])
+            if watermark is not None and row['timestamp'] <= watermark:
+                break
+            rows.append(row)
+            if watermark is None:
+                break
+            end = content.rfind(b'}', 0, start)
+    except (ValueError, KeyError):
+        rows = [r for r in json.loads(content) if watermark is None or r['timestamp'] > watermark]
+        return rows[-1:] if watermark is None else rows
+    rows.reverse()
+    return rows
+
+
+def _metrics_new(s: "DPSSession", entity: str, entity_id: str, watermarks, seen,
+                 deadline=None, **extra):
+    """the samples of the metrics of an entity not seen by a previous run
+
+    The latest known sample is repeated with the time it was collected if
+    there is no new one. The new watermark is put into seen.
+    """
+    key = f"{entity}:{entity_id}"
+    mark = watermarks.get(key)
+    interval, retention = METRICS_INTERVAL.get(entity, PERFORMANCE_INTERVAL)
+    watermark = mark["row"]["timestamp"] if mark else None
+    if mark is None or time.time() - mark["seen"] > retention:
+        interval = "Best_Available"
+        if entity in METRICS_HISTORY:
+            interval, watermark = METRICS_HISTORY[entity], ""
+    content = s.query_post_json('metrics/generate', {
+              "entity": entity,
+              "entity_id": entity_id,
+              "interval": interval,
+            }, raw=True, deadline=deadline)
+    rows = _rows_newer(content, watermark)
+    if not rows:
+        return _repeated(mark, extra)
+    seen[key] = {"seen": time.time(), "row": rows[-1]}
+    return [{**row, **extra} for row in rows]
+
+
+def _repeated(mark, extra) -> list:
+    """the latest known sample of an entity, written with the time it was collected
+
+    The checks flag it as stale once it is older than two runs.
+    """
+    if not mark:
+        return []
+    return [{**mark["row"], **extra, "collected": mark["seen"], "refresh": CHECK_INTERVAL}]
+
+
+def _metrics(s: "DPSSession", entity: str, objs, watermarks, deadline=None, **names):
+    """the new metrics samples of the objects, requested concurrently
 
+    An object whose request fails, e.g. by 404 as it was deleted after it was
+    listed, or is not done by the deadline is logged and only its latest known
+    sample is repeated. The section fails if the requests of all objects fail
+    or the login is rejected. Only the watermarks of the objects with new
+    samples advance. The objects seen longest ago are requested first, so runs
+    cut short by the deadline don't always skip the same ones.
+    """
+    # pylint: disable=import-outside-toplevel
+    from cmk_addons.plugins.dell.powerstore_api import DPSDeadline, DPSUnauthorized
+
+    seen = {}
+    errors = []
+    late = []
+
+    def _entity_rows(o):
+        extra = {k: o[v] for k, v in names.items()}
+        try:
+            return _metrics_new(s, entity, o['id'], watermarks, seen, deadline, **extra)
+        except DPSUnauthorized:
+            raise
+        except DPSDeadline as exc:
+            late.append(exc)
+        except Exception as exc:
+            LOGGER.warning("%s of %s failed: %s", entity, o['id'], exc)
+            errors.append(exc)
+        return _repeated(watermarks.get(f"{entity}:{o['id']}"), extra)
+
+    def _seen(o):
+        return (watermarks.get(f"{entity}:{o['id']}") or {}).get("seen", 0)
+
+    rows = list(itertools.chain.from_iterable(s.map(_entity_rows, sorted(objs, key=_seen))))
+    if objs and len(errors) + len(late) == len(objs):
+        raise (late or errors)[-1]
+    if late:
+        LOGGER.warning("%s: deadline passed, %d of %d objects not requested",
+                       entity, len(late), len(objs))
+    watermarks.update(seen)
+    return rows
+
+
+def _shard_of(object_id: str, shards: int) -> int:
+    """the shard of an object by the crc32 of its id, stable as objects come and go"""
+    return zlib.crc32(object_id.encode()) % shards
+
+
+def _sharded_metrics(s: "DPSSession", entity: str, objs, cache, shards: int,
+                     budget=None, deadline=None, **names):
+    """the latest metrics sample of every object, fetched for one shard per run
+
+    The samples of the other shards are the ones of earlier runs kept in the
+    run state, they are the watermarks of the objects as well. They are written
+    even if the requests of the shard fail, the next run continues with the next
+    shard. Every sample is written with the time it was collected and the
+    expected time between two collections of the object, a repeated sample
+    keeps the time of its collection.
+
+    At most budget objects are requested per run, the ones collected longest
+    ago first. The budget left by a small shard goes to the objects of other
+    shards that are overdue.
+    """
+    # pylint: disable=import-outside-toplevel
+    from cmk_addons.plugins.dell.powerstore_api import DPSUnauthorized
+
+    now = time.time()
+    state = cache.get_state(f"{entity}_shards") or {}
+    shard = state.get("next", 0) % shards
+    interval = CHECK_INTERVAL
+    if "last_run" in state and 0 < now - state["last_run"] < 86400:
+        interval = now - state["last_run"]
+
+    samples = state.get("samples", {})
+    refresh = shards * interval
+
+    def _collected(o):
+        return samples.get(o['id'], {}).get("collected", 0)
+
+    todo = sorted((o for o in objs if _shard_of(o['id'], shards) == shard), key=_collected)
+    if budget is not None:
+        overdue = sorted((o for o in objs if _shard_of(o['id'], shards) != shard
+                          and now - _collected(o) >= refresh), key=_collected)
+        todo = (todo + overdue)[:budget]
+    LOGGER.info("%s: shard %d of %d, %d objects", entity, shard + 1, shards, len(todo))
+    watermarks = {f"{entity}:{k}": {"seen": v["collected"], "row": v} for k, v in samples.items()}
+    try:
+        for row in _metrics(s, entity, todo, watermarks, deadline, id='id', **names):
+            if "collected" in row and row['id'] in samples:
+                continue
+            samples[row['id']] = {**row, "collected": row.get("collected", now)}
+    except DPSUnauthorized:
+        raise
+    except Exception as exc:
+        LOGGER.warning("%s: shard %d of %d failed, writing the cached samples: %s",
+                       entity, shard + 1, shards, exc)
+    ids = {o['id'] for o in objs}
+    samples = {k: v for k, v in samples.items() if k in ids}
+
+    cache.put_state(f"{entity}_shards", {"next": shard + 1, "last_run": now, "samples": samples})
+    return [{**row, "refresh": refresh} for row in samples.values()]
+
+
+def _host_name(name: str) -> str:
+    """name with the characters not valid in host names replaced by '_'"""
+    return "".join(c if c.isascii() and (c.isalnum() or c in "._-") else "_" for c in name)
+
+
+def _piggyback_hosts(mode, appliance, node):
+    """functions giving the piggyback host of an item by section"""
+    if mode is None:
+        return {}
+    appliance_host = {a['id']: a.get('name') or a['id'] for a in appliance}
+    node_host = {n['id']: n.get('name') or n['id'] for n in node}
+
+    def of_appliance(d):
+        return appliance_host.get(d.get('appliance_id'))
+
+    def of_node(d):
+        return node_host.get(d.get('node_id'))
+
+    of_volume = of_appliance
+    if mode == "volume":
+        # volume names are unique within an appliance only
+        def of_volume(d):
+            app_host = of_appliance(d)
+            if app_host is None or not d.get('name'):
+                return None
+            return _host_name(f"{app_host}-{d['name']}")
+
+    return {
+        "appliance": lambda d: appliance_host.get(d.get('id')),
+        "hardware": of_appliance,
+        "volume": of_volume,
+        "performance_metrics_by_appliance": of_appliance,
+        "performance_metrics_by_node": of_node,
+        "performance_metrics_by_fe_fc_port": of_node,
+        "performance_metrics_by_volume": of_volume,
+        "space_metrics_by_appliance": of_appliance,
+    }
+
+
+def get_information(s: "DPSSession", args: Args, cache: SectionCache | None = None,
+                    process_stats: bool = True):
+    """get an information from the REST API interface
+
+    The CPU time and peak memory of the process are only reported with
+    process_stats, in the collector they are the ones of all arrays.
+    """
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ThreadPoolExecutor
+
+    from cmk_addons.plugins.dell.powerstore_api import DPSUnauthorized
+
+    t_start = time.monotonic()
+    ru_start = resource.getrusage(resource.RUSAGE_SELF)
+    run_deadline = t_start + args.run_budget if args.run_budget else None
+    ttl = {**DEFAULT_SECTION_TTL, **dict(args.section_ttl)}
+    wanted = set(args.sections or SECTIONS)
+    if not args.volume_performance:
+        wanted.discard("performance_metrics_by_volume")
+    # Commands limited to different sections run concurrently, each of them keeps
+    # the watermarks of its own metrics.
+    watermarks_name = "metrics_watermarks"
+    if args.sections:
+        watermarks_name += "_" + _digest(",".join(sorted(args.sections)))[:8]
+    watermarks = {}
+    if cache is not None:
+        watermarks = cache.get_state(watermarks_name) or {}
+    # sections without current data: the error, the age of the replayed data
+    failed: dict[str, str] = {}
+    stale: dict[str, float] = {}
+    # when the data of the sections collected on a longer interval was fetched
+    collected_at: dict[str, float] = {}
+
+    def _url(collection):
+        return f"{collection}?select={'*' if args.select_all else select(collection)}"
+
+    def _get(collection, deadline):
+        return s.query_get(_url(collection), deadline=deadline)
+
+    def _get_spooled(collection, deadline, keep=None):
+        spool = JsonArraySpool(keep)
+        for page in s.query_get_pages(_url(collection), deadline=deadline):
+            spool.extend(page)
+        return spool
+
+    def _primary(volume):
+        if volume.get('type') == 'Primary':
+            return {k: volume[k] for k in ('id', 'name', 'appliance_id')}
+        return None
+
+    def _collect(name, fetch):
+        """data of a section, from the cache while its TTL lasts"""
+        if cache is not None and ttl.get(name):
+            cached = cache.get(name, ttl[name])
+            if cached is not None:
+                LOGGER.info("section %s served from the cache", name)
+                collected_at[name] = cached[0]
+                return cached[1]
+        deadline = run_deadline
+        if args.section_timeout:
+            deadline = min(deadline or math.inf, time.monotonic() + args.section_timeout)
+        data = fetch(deadline)
+        if cache is not None and (ttl.get(name) or args.replay_cache):
+            cache.put(name, data)
+        if ttl.get(name):
+            collected_at[name] = time.time()
+        return data
+
+    def _result(name, future):
+        """the data of a section, the last good data if its collection failed"""
+        if future is None:
+            exc = "depends on a failed section"
+        else:
+            try:
+                # the requests of a collection end by its deadline, plus a second of grace
+                timeout = None if run_deadline is None else max(
+                        run_deadline - time.monotonic(), 0) + 1
+                return future.result(timeout=timeout)
+            except DPSUnauthorized:
+                raise
+            except TimeoutError:
+                exc = "timed out"
+            except Exception as e:
+                if args.debug:
+                    raise
+                exc = str(e) or type(e).__name__
+        failed[name] = exc
+        cached = cache.get(name) if cache is not None else None
+        if cached is None:
+            LOGGER.error("section %s failed: %s", name, exc)
+            return None
+        LOGGER.warning("section %s failed, replayed from the cache: %s", name, exc)
+        stale[name] = time.time() - cached[0]
+        collected_at[name] = cached[0]
+        return cached[1]
+
+    def _submit(name, fetch):
+        futures[name] = pool.submit(_collect, name, fetch)
+
+    def _submit_metrics(entity, objs, shards=1, budget=None, **names):
+        if entity not in wanted:
+            return
+        if objs is None:
+            futures[entity] = None
+            return
+        if shards > 1:
+            _submit(entity, lambda deadline: _sharded_metrics(
+                    s, entity, objs, cache, shards, budget, deadline, **names))
+            return
+        _submit(entity, lambda deadline: _metrics(s, entity, objs, watermarks, deadline,
+                                                  **names))
+
+    def _data(name):
+        return _result(name, futures[name]) if name in futures else None
+
+    # The collections the wanted sections need. All queries are submitted up front
+    # and share the authenticated session, the sections are written afterwards in a
+    # fixed order. A failing or late collection only costs its own section.
+    futures = {}
+    pool = ThreadPoolExecutor(max_workers=args.max_workers)
+    try:
+        if "check_mk" in wanted:
+            _submit("check_mk", lambda d: s.query_get('openapi.json', deadline=d)['info'])
+        if wanted & {"appliance", "performance_metrics_by_appliance",
+                     "space_metrics_by_appliance"} or args.piggyback:
+            _submit("appliance", lambda d: _get('appliance', d))
+        if "hardware" in wanted:
+            _submit("hardware", lambda d: _get_spooled('hardware', d))
+        if wanted & {"volume", "performance_metrics_by_volume"}:
+            _submit("volume", lambda d: _get_spooled('volume', d, _primary))
+        if "performance_metrics_by_node" in wanted or args.piggyback:
+            _submit("node", lambda d: _get('node', d))
+        if "performance_metrics_by_fe_fc_port" in wanted:
+            _submit("fc_port", lambda d: _get('fc_port', d))
+
+        appliance = _data("appliance")
+        _submit_metrics("performance_metrics_by_appliance", appliance)
+        _submit_metrics("space_metrics_by_appliance", appliance)
+        node = _data("node")
+        _submit_metrics("performance_metrics_by_node", node, name='name')
+        _submit_metrics("performance_metrics_by_fe_fc_port", _data("fc_port"),
+                        name='name', node_id='node_id')
+        volume = _data("volume")
+        if volume is not None:
+            volume = _spooled(volume, _primary)
+        volume_shards = args.volume_shards
+        if volume is not None and args.volume_budget:
+            volume_shards = max(volume_shards, -(-len(volume.kept) // args.volume_budget))
+        _submit_metrics("performance_metrics_by_volume", volume and volume.kept,
+                        shards=volume_shards, budget=args.volume_budget,
+                        name='name', appliance_id='appliance_id')
+
+        # only the time spent writing, the sections are written as their data arrives
+        write_time = 0.0
+        if "check_mk" in wanted:
+            ainfo = _data("check_mk")
+            with SectionWriter("check_mk", " ") as w:
+                w.append("Version: 2.0")
+                if ainfo is not None:
+                    w.append(f"AgentOS: {ainfo['title']} {ainfo['version']}")
+
+        host_of = _piggyback_hosts(args.piggyback, appliance or [], node or [])
+        for name in SECTIONS:
+            if name == "check_mk" or name not in wanted:
+                continue
+            if name == "appliance":
+                data = appliance
+            elif name == "volume":
+                data = volume
+            else:
+                data = _data(name)
+            if data is not None:
+                cached = None
+                if name in collected_at:
+                    cached = (collected_at[name], ttl.get(name) or CHECK_INTERVAL)
+                t_write = time.monotonic()
+                _write_section(name, data, host_of.get(name), cached,
+                               COMPACT_INTERNED.get(name) if args.compact else None)
+                write_time += time.monotonic() - t_write
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if cache is not None:
+        # the watermarks of objects not seen for a day, e.g. deleted ones, are dropped
+        now = time.time()
+        cache.put_state(watermarks_name,
+                        {k: v for k, v in watermarks.items() if now - v["seen"] < 86400})
+
+    stats = {
+        "wall_time": time.monotonic() - t_start,
+        "write_time": write_time,
+        "connections": s.connections(),
+        "calls": call_stats(s.timings),
+        "failed": failed,
+        "stale": stale,
+        "sections": sorted(wanted),
+    }
+    if process_stats:
+        ru_end = resource.getrusage(resource.RUSAGE_SELF)
+        stats["cpu_time"] = (ru_end.ru_utime + ru_end.ru_stime
+                             - ru_start.ru_utime - ru_start.ru_stime)
+        # kilobytes on Linux
+        stats["peak_rss"] = ru_end.ru_maxrss * 1024
+    with SectionWriter("dell_powerstore_agent_stats") as w:
+        w.append_json(stats)
+
+    return 0
+
+
+def call_stats(timings) -> list[dict]:
+    """the requests of the run summed up by REST call"""
+    calls = {}
+    for call, _urlsubd, status, elapsed, size, _wire in timings:
+        c = calls.setdefault(call, {
+            "call": call, "requests": 0, "seconds": 0.0, "max_seconds": 0.0,
+            "bytes": 0, "status": {},
+        })
+        c["requests"] += 1
+        c["seconds"] += elapsed
+        c["max_seconds"] = max(c["max_seconds"], elapsed)
+        c["bytes"] += size
+        c["status"][str(status)] = c["status"].get(str(status), 0) + 1
+    return list(calls.values())
+
+
+def log_timings(s: "DPSSession") -> None:
+    """log the per-request timing breakdown"""
+    for _call, urlsubd, status, elapsed, size, wire in s.timings:
+        LOGGER.info("%8.3fs %d %9d B %9d B on the wire %s", elapsed, status, size, wire, urlsubd)
+    LOGGER.info("%8.3fs total time spent in %d requests, %d bytes received, "
+                "%d bytes on the wire, %d connections opened",
+                sum(t[3] for t in s.timings), len(s.timings), sum(t[4] for t in s.timings),
+                sum(t[5] for t in s.timings), s.connections())
+
+
+def _connect(args: Args) -> "DPSSession":
+    """a session logged in to the array, reusing a cached login session"""
+    # pylint: disable=import-outside-toplevel
+    from cmk_addons.plugins.dell.powerstore_api import DPSSession
+
+    if args.no_cert_check:
+        verify = False
+    else:
+        verify = args.ca_bundle
+
+    if args.password_id:
+        pw_id, pw_path = args.password_id.split(":")
+    pw = args.password or cmk.utils.password_store.lookup(Path(pw_path), pw_id)
+
+    s = DPSSession(args.host_address, args.port, verify, args.user, pw,
+                   max_workers=args.max_workers, page_size=args.page_size,
+                   rate_limit=args.rate_limit, retries=args.retries,
+                   retry_backoff=args.retry_backoff, timeout=args.timeout)
+    cache = None
+    if not args.no_session_cache:
+        cache = DPSSessionCache(args.host_address, args.port, args.user)
+    if cache is None or not s.restore(cache.load()):
+        s.login()
+    return s
+
+
+def _collect(s: "DPSSession", args: Args, process_stats: bool = True) -> None:
+    """write the agent output of one run"""
+    # pylint: disable=import-outside-toplevel
+    from cmk_addons.plugins.dell.powerstore_api import DPSUnauthorized
+
+    cache = None
+    if not args.no_session_cache:
+        cache = DPSSessionCache(args.host_address, args.port, args.user)
+    section_cache = None
+    if not args.no_section_cache:
+        section_cache = SectionCache(args.host_address, args.port, args.user,
+                                     args.cache_max_size * 1024**2)
+    t0 = time.monotonic()
+    try:
+        get_information(s, args, section_cache, process_stats)
+    except DPSUnauthorized:
+        if cache is not None:
+            cache.remove()
+        raise
+    if cache is not None:
+        cache.store(s.state())
+    log_timings(s)
+    LOGGER.info("%8.3fs wall time of the collection", time.monotonic() - t0)
+    # the statistics of the next run of the collector start with its first request
+    s.reset_stats()
+
+
+#.
+#   .--Collector-----------------------------------------------------------.
+#   |                                                                      |
+#   |                 ____      _ _           _                            |
+#   |                / ___|___ | | | ___  ___| |_ ___  _ __                |
+#   |               | |   / _ \| | |/ _ \/ __| __/ _ \| '__|               |
+#   |               | |__| (_) | | |  __/ (__| || (_) | |                  |
+#   |                \____\___/|_|_|\___|\___|\__\___/|_|                  |
+#   |                                                                      |
+#   '----------------------------------------------------------------------'
+
+
+def _spool_path(spool_dir: Path | None, args: Args) -> Path:
+    if spool_dir is None:
+        spool_dir = Path(cmk.utils.paths.tmp_dir) / "agents" / "agent_dell_powerstore" / "spool"
+    import re  # pylint: disable=import-outside-toplevel
+
+    name = re.sub(r"[^\w.-]", "_", f"{args.host_address}_{args.port}")
+    return spool_dir / f"{name}.txt"
+
+
+def _print_spool(args: Args) -> bool:
+    """output the data of the collector if it is recent enough"""
+    path = _spool_path(args.spool_dir, args)
+    try:
+        with path.open() as f:
+            if time.time() - os.fstat(f.fileno()).st_mtime > args.from_spool:
+                LOGGER.info("spool file %s is outdated", path)
+                return False
+            sys.stdout.write(f.read())
+    except FileNotFoundError:
+        LOGGER.info("spool file %s does not exist", path)
+        return False
+    return True
+
+
+class _ThreadStdout(io.TextIOBase):
+    """sys.stdout writing to a stream selected per thread
+
+    The collector polls the arrays in parallel threads, every thread writes the
+    sections of its array to its own buffer.
+    """
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def redirect(self, stream) -> None:
+        self._local.stream = stream
+
+    def write(self, text):
+        return getattr(self._local, "stream", self._default).write(text)
+
+    def flush(self):
+        getattr(self._local, "stream", self._default).flush()
+
+
+def _poll_array(args: Args, spool_dir: Path | None, interval: int, stdout: _ThreadStdout):
+    """keep the spool file of one array up to date"""
+    path = _spool_path(spool_dir, args)
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    s = None
+    while True:
+        t0 = time.monotonic()
+        try:
+            if s is None:
+                s = _connect(args)
+            buf = io.StringIO()
+            stdout.redirect(buf)
+            _collect(s, args, process_stats=False)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(buf.getvalue())
+            os.replace(tmp, path)
+        except Exception as exc:
+            LOGGER.error("%s: %s", args.host_address, exc)
+            if s is not None:
+                s.close()
+            s = None
+        finally:
+            stdout.redirect(stdout._default)
+        time.sleep(max(interval - (time.monotonic() - t0), 1))
+
+
+def run_collector(args: Args) -> int:
+    """poll the arrays of the collector configuration until terminated"""
+    import shlex  # pylint: disable=import-outside-toplevel
+
+    arrays = []
+    with open(args.collector) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                arrays.append(parse_arguments(shlex.split(line)))
+
+    # every array has the timeout of its line, -t of the collector is not used
+    stdout = _ThreadStdout(sys.stdout)
+    sys.stdout = stdout
+    threads = [
+        threading.Thread(target=_poll_array, name=a.host_address, daemon=True,
+                         args=(a, args.spool_dir, args.collector_interval, stdout))
+        for a in arrays
+    ]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            t.join()
+    except KeyboardInterrupt:
+        pass
     return 0
 
 
@@ -244,20 +1210,19 @@ def get_information(s: DPSSession, args: Args):
 def agent_dell_powerstore_main(args: Args) -> int:
     """main function for the special agent"""
 
-    if args.no_cert_check:
-        verify = False
-    else:
-        verify = args.ca_bundle
+    if args.collector:
+        return run_collector(args)
 
-    if args.password_id:
-        pw_id, pw_path = args.password_id.split(":")
-    pw = args.password or cmk.utils.password_store.lookup(Path(pw_path), pw_id)
+    # the collector writes all sections, a call limited to some collects itself
+    if args.from_spool is not None and not args.sections and _print_spool(args):
+        return 0
+
+    import socket  # pylint: disable=import-outside-toplevel
 
     socket.setdefaulttimeout(args.timeout)
     try:
-        s = DPSSession(args.host_address, args.port, verify, args.user, pw)
-        s.query_get("login_session")
-        get_information(s, args)
+        s = _connect(args)
+        _collect(s, args)
 
     except Exception as exc:
         if args.debug: